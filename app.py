@@ -1,127 +1,273 @@
 # app.py
 
-from threading import Thread
+from threading import Thread, Lock
+from functools import lru_cache, partial
+from importlib import import_module
+from uuid import uuid4
 import dash
-from dash import html, Input, Output, State, callback_context as ctx, callback
+from dash import html, dcc, Input, Output, State, ClientsideFunction, callback_context as ctx, callback
 import dash_bootstrap_components as dbc
 # Ensure all your custom modules are accessible in the Python path
-from data import cities_df
-from tabs.world_tab import world_layout
-from tabs.continent_tab import continent_layout
-from tabs.country_tab import country_layout
-from tabs.region_tab import region_layout
-from tabs.city_tab import city_layout
-from utils import get_world_df, get_continent_df, get_country_df, get_region_df, get_city_row
-from data_loader import get_data_incremental, get_countries_by_continent, get_regions_by_country, get_cities_by_region, get_city_forecast
-from views.world_view import render_world_view
-from views.continent_view import render_continent_view
-from views.country_view import render_country_view
-from views.region_view import render_region_view
-from views.city_view import render_city_view
+# pandas, plotly and the city data are heavy, so utils/data_loader/views are imported
+# inside the callbacks that use them instead of here (see startup_profile.py)
+from data import get_cities_df
+from metrics import timed, increment, register_gauge, register_metrics_endpoint
+from profiling import profiled, profile_target, register_profiles_endpoint
+from result_store import ResultStore
+from scheduler import request_scheduler, session_context
+from prefetch import forecast_prefetcher
+from http_cache import asset_url, register_http_caching
+from place_hierarchy import register_places_endpoint
+from geo_assets import check_topojson_files, register_topojson_endpoint
 from dotenv import load_dotenv
 import os
 
 load_dotenv(".env")
 
-progress = {"value": 0}
-result_df = {
-    "world": None,
-    "continent": None,
-    "country": None,
-    "region": None,
-    "city": None
-}
-
-def update_progress(p):
-    global progress
-    progress["value"] = p
-
-def run_weather_fetch(df, fn, key):
-    global result_df
-    progress["value"] = 0
-    result_df[key] = fn(df, step_callback=update_progress)
+# Per-session state, keyed by (session_id, tab key). Results are kept compactly
+# under RESULT_MEMORY_BUDGET_MB with LRU eviction across sessions.
+progress = {}
+result_store = ResultStore()
+
+in_flight = {"jobs": 0}
+in_flight_lock = Lock()
+
+def run_weather_fetch(df, fn, key, session_id):
+    def update_progress(p):
+        progress[(session_id, key)] = p
+
+    update_progress(0)
+    with in_flight_lock:
+        in_flight["jobs"] += 1
+    increment("jobs.started", scope=key)
+    try:
+        # Outbound requests of this job share the API with every other session (scheduler.py)
+        with session_context(session_id), timed(f"job.{key}"):
+            result = fn(df, step_callback=update_progress, scope=key)
+        if result is not None:
+            # Sampling metadata travels with the result to the view (views.progress_view.render_coverage_note),
+            # measured on the points that arrived when a deadline or failures cut the plan short
+            if df is not None and "coverage" in df.attrs:
+                from utils import result_coverage
+                result.attrs["coverage"] = result_coverage(get_cities_df(), df, result)
+            result_store.put(session_id, key, result)
+    finally:
+        with in_flight_lock:
+            in_flight["jobs"] -= 1
+        # Failed or empty: nothing for take_result to pick up, so don't leave the entry behind
+        if not result_store.has(session_id, key):
+            progress.pop((session_id, key), None)
+
+def start_weather_fetch(df, fn, key, session_id):
+    # Drop the previous result first, so a finished progress bar never renders stale data
+    result_store.discard(session_id, key)
+    progress[(session_id, key)] = 0
+    Thread(target=profile_target(run_weather_fetch, f"fetch-{key}"), args=(df, fn, key, session_id), daemon=True).start()
+
+def choose_fetch(deadline):
+    """get_data_incremental, or its time-budgeted variant when a deadline (seconds) is set."""
+    from data_loader import get_data_incremental, get_data_within_deadline
+    if deadline:
+        return partial(get_data_within_deadline, deadline_seconds=float(deadline))
+    return get_data_incremental
+
+def take_result(session_id, key):
+    """Returns the finished result for this session's tab, or None while still fetching."""
+    if progress.get((session_id, key), 0) < 100:
+        return None
+    df = result_store.get(session_id, key)
+    if df is not None:
+        progress.pop((session_id, key), None)
+    return df
 
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
 
-app.layout = dbc.Container([
-    # This overlay div helps with readability on top of a busy background image
-    html.Div(style={
-        'position': 'absolute', # Positions relative to the parent container
-        'top': 0, 'left': 0,
-        'width': '100%', 'height': '100%',
-        'background-color': 'rgba(255, 255, 255, 0.6)', # White overlay, 60% opaque
-        'z-index': 0 # Rendered below other content
-    }),
-    dbc.Tabs([
-        dbc.Tab(label="World", tab_id="world"),
-        dbc.Tab(label="Continent", tab_id="continent"),
-        dbc.Tab(label="Country", tab_id="country"),
-        dbc.Tab(label="Region", tab_id="region"),
-        dbc.Tab(label="City", tab_id="city"),
-    ], id="tabs", active_tab="world", className="mt-4", style={'z-index': 1, 'position': 'relative'}), # Ensure tabs are above overlay
-    html.Div(id="tab-content", className="p-4", style={'z-index': 1, 'position': 'relative'}) # Ensure content is above overlay
-], fluid=True, style={
-    'background-image': 'url("/assets/360_F_211524227_Ett8aboQvVnROAFtqu3S1pW99Y3Th9vm.jpg")', # Path to your image in the assets folder
-    # Or use an online image URL like: 'url("https://images.unsplash.com/photo-1596706857999-edb201a073f1?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w1MjcwNzV8MHwxfHNlYXJjaHwxNXx8Y2xvdWRzJTIwYmFja2dyb3VuZHxlbnwwfHx8fDE3MTk5MjczODl8MA&ixlib=rb-4.0.3&q=80&w=1080")',
-    'background-size': 'cover',          # Image covers the entire container
-    'background-repeat': 'no-repeat',    # Prevents image repetition
-    'background-position': 'center center', # Centers the image
-    'min-height': '100vh',               # Ensures background covers the full viewport height
-    'background-attachment': 'fixed',    # Background scrolls with the content
-    'position': 'relative',              # Needed for z-index of absolute children (the overlay)
-    'padding-bottom': '50px'             # Add some padding at the bottom if content is long
-})
+def cache_hit_ratio(cached_fn):
+    info = cached_fn.cache_info()
+    lookups = info.hits + info.misses
+    return round(info.hits / lookups, 4) if lookups else None
+
+# GET /metrics -> latency percentiles per stage, API call/byte counters, gauges
+register_metrics_endpoint(app.server)
+# GET /profiles -> recent profiles written when PROFILE=1 or `X-Profile: 1` is sent
+register_profiles_endpoint(app.server)
+# gzip/brotli above COMPRESS_MIN_BYTES, immutable fingerprinted assets, ETags
+register_http_caching(app.server)
+# GET /places/<name>.json -> location hierarchy for the client-side dropdown cascade
+register_places_endpoint(app.server)
+# GET /topojson/<digest>/<name>.json -> geo base maps; fails here if they were never fetched
+check_topojson_files()
+register_topojson_endpoint(app.server)
+register_gauge("jobs.in_flight", lambda: in_flight["jobs"])
+register_gauge("cache.tab_layout.hit_ratio", lambda: cache_hit_ratio(get_tab_layout))
+register_gauge("cache.cities_df.hit_ratio", lambda: cache_hit_ratio(get_cities_df))
+register_gauge("results", result_store.stats)
+register_gauge("scheduler", request_scheduler.stats)
+
+def loaded_cache_stats(module_name, cache_name):
+    # Only report caches whose module has been imported (they are loaded lazily)
+    import sys
+    module = sys.modules.get(module_name)
+    return getattr(module, cache_name).stats() if module else None
+
+register_gauge("cache.observations", lambda: loaded_cache_stats("data_loader", "observation_cache"))
+register_gauge("cache.sample_plans", lambda: loaded_cache_stats("utils", "sample_plan_cache"))
+register_gauge("cache.forecasts", lambda: loaded_cache_stats("data_loader", "forecast_cache"))
+register_gauge("prefetch", forecast_prefetcher.stats)
+
+def serve_layout():
+    # Served per page load, so every browser tab gets its own session id
+    return dbc.Container([
+        dcc.Store(id="session-id", data=str(uuid4())),
+        # This overlay div helps with readability on top of a busy background image
+        html.Div(style={
+            'position': 'absolute', # Positions relative to the parent container
+            'top': 0, 'left': 0,
+            'width': '100%', 'height': '100%',
+            'background-color': 'rgba(255, 255, 255, 0.6)', # White overlay, 60% opaque
+            'z-index': 0 # Rendered below other content
+        }),
+        dbc.Tabs([
+            dbc.Tab(label="World", tab_id="world"),
+            dbc.Tab(label="Continent", tab_id="continent"),
+            dbc.Tab(label="Country", tab_id="country"),
+            dbc.Tab(label="Region", tab_id="region"),
+            dbc.Tab(label="City", tab_id="city"),
+        ], id="tabs", active_tab="world", className="mt-4", style={'z-index': 1, 'position': 'relative'}), # Ensure tabs are above overlay
+        html.Div(id="tab-content", className="p-4", style={'z-index': 1, 'position': 'relative'}) # Ensure content is above overlay
+    ], fluid=True, style={
+        'background-image': f'url("{asset_url(app, "360_F_211524227_Ett8aboQvVnROAFtqu3S1pW99Y3Th9vm.jpg")}")', # Fingerprinted, so browsers cache it for a year
+        # Or use an online image URL like: 'url("https://images.unsplash.com/photo-1596706857999-edb201a073f1?crop=entropy&cs=tinysrgb&fit=max&fm=jpg&ixid=M3w1MjcwNzV8MHwxfHNlYXJjaHwxNXx8Y2xvdWRzJTIwYmFja2dyb3VuZHxlbnwwfHx8fDE3MTk5MjczODl8MA&ixlib=rb-4.0.3&q=80&w=1080")',
+        'background-size': 'cover',          # Image covers the entire container
+        'background-repeat': 'no-repeat',    # Prevents image repetition
+        'background-position': 'center center', # Centers the image
+        'min-height': '100vh',               # Ensures background covers the full viewport height
+        'background-attachment': 'fixed',    # Background scrolls with the content
+        'position': 'relative',              # Needed for z-index of absolute children (the overlay)
+        'padding-bottom': '50px'             # Add some padding at the bottom if content is long
+    })
+
+app.layout = serve_layout
+
+# Heavy modules are imported lazily (see startup_profile.py), but several request threads
+# importing numpy/pandas for the first time at once can see a partially initialised module
+# (or crash: plotly's JSON encoder imports numpy while serialising /_dash-layout). So the
+# first request past the static bundles imports them under a lock; later ones skip past.
+heavy_imported = False
+heavy_import_lock = Lock()
+
+@app.server.before_request
+def import_heavy_modules_once():
+    global heavy_imported
+    if heavy_imported:
+        return
+    from flask import request
+    # Static bundles are plain files and never import anything
+    if request.path.startswith(("/assets/", "/_dash-component-suites/")):
+        return
+    with heavy_import_lock:
+        if not heavy_imported:
+            with timed("import.pandas"):
+                import numpy  # noqa: F401
+                import pandas  # noqa: F401
+            heavy_imported = True
+
+
+# tab id -> (module, layout builder)
+TAB_LAYOUTS = {
+    "world": ("tabs.world_tab", "world_layout"),
+    "continent": ("tabs.continent_tab", "continent_layout"),
+    "country": ("tabs.country_tab", "country_layout"),
+    "region": ("tabs.region_tab", "region_layout"),
+    "city": ("tabs.city_tab", "city_layout"),
+}
+
+@lru_cache(maxsize=None)
+def get_tab_layout(tab):
+    """Builds (once) and returns the layout for a tab; only the requested tab is built."""
+    module_name, builder = TAB_LAYOUTS[tab]
+    return getattr(import_module(module_name), builder)()
 
 
 @app.callback(
     Output("tab-content", "children"),
     Input("tabs", "active_tab")
 )
+@timed("callback.render_tab")
 def render_tab(tab):
     """Renders the content for the selected tab."""
-    # This callback works by returning the layout defined in each tab's module.
-    # Ensure these world_layout(), continent_layout(), etc., functions
-    # are correctly defined and return valid Dash components.
-    return {
-        "world": world_layout(),
-        "continent": continent_layout(),
-        "country": country_layout(),
-        "region": region_layout(),
-        "city": city_layout()
-    }.get(tab, html.Div("Tab not found."))
-
+    # Layouts are static, so each one is built the first time its tab is opened
+    # and reused on every later switch.
+    if tab not in TAB_LAYOUTS:
+        return html.Div("Tab not found.")
+    return get_tab_layout(tab)
+
+# The dropdown cascades run in the browser (assets/places.js) on the hierarchy files
+# from place_hierarchy.py, so picking a continent, country or region costs no request.
 # Drop downs for country tab
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="places", function_name="countriesByContinent"),
     Output("dropdown-country", "options"),
-    Input("continent-dropdown-country", "value")
+    Input("continent-dropdown-country", "value"),
+    State("place-urls", "data"),
 )
-def update_country_options(selected_continent):
-    return get_countries_by_continent(cities_df, selected_continent)
 
 # Drop downs for region tab
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="places", function_name="regionsByCountry"),
     Output("dropdown-region", "options"),
-    Input("country-dropdown-region", "value")
+    Input("country-dropdown-region", "value"),
+    State("place-urls", "data"),
 )
-def update_region_options(selected_country):
-    return get_regions_by_country(cities_df, selected_country)
 
 #Drop downs for city tab
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="places", function_name="regionsByCountry"),
     Output("region-dropdown-city", "options"),
-    Input("country-dropdown-city", "value")
+    Input("country-dropdown-city", "value"),
+    State("place-urls", "data"),
 )
-def update_region_options_city_tab(selected_country):
-    return get_regions_by_country(cities_df, selected_country)
 
-@app.callback(
+app.clientside_callback(
+    ClientsideFunction(namespace="places", function_name="citiesByRegion"),
     Output("dropdown-city", "options"),
     Input("country-dropdown-city", "value"),
     Input("region-dropdown-city", "value"),
+    State("place-urls", "data"),
 )
-def update_city_options(selected_country, selected_region):
-    return get_cities_by_region(cities_df, selected_country, selected_region)
+
+# Place search for city tab: only the top matches for what has been typed are sent
+@app.callback(
+    Output("place-search-city", "options"),
+    Input("place-search-city", "search_value"),
+)
+@timed("callback.search_places")
+def update_place_search_options(search_value):
+    if not search_value:
+        # Keep the options as they are, so the selected place stays selected
+        raise dash.exceptions.PreventUpdate
+    from search_index import search_places
+    return search_places(search_value)
+
+# The search and the dropdown cascade are alternatives: picking in one clears the other
+@app.callback(
+    Output("country-dropdown-city", "value"),
+    Input("place-search-city", "value"),
+    prevent_initial_call=True,
+)
+@timed("callback.clear_city_cascade")
+def clear_city_cascade(place):
+    return None if place else dash.no_update
+
+@app.callback(
+    Output("place-search-city", "value"),
+    Input("dropdown-city", "value"),
+    prevent_initial_call=True,
+)
+@timed("callback.clear_place_search")
+def clear_place_search(city):
+    return None if city else dash.no_update
 
 
 # --------------MAIN CALLBACKS-----------------
@@ -133,29 +279,117 @@ def update_city_options(selected_country, selected_region):
     Output("progress-wrapper-world", "style"),
     Output("progress-interval-world", "disabled"),
     Input("submit-world", "n_clicks"),
+    Input("show-sweep-world", "n_clicks"),
     Input("progress-interval-world", "n_intervals"),
     State("cap-size-world", "value"),
+    State("deadline-world", "value"),
+    State("sampling-world", "value"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def handle_world_tab(n_clicks, n_intervals, cap_size):
-    global progress, result_df
-
+@timed("callback.handle_world_tab")
+@profiled("handle_world_tab")
+def handle_world_tab(n_clicks, n_sweep_clicks, n_intervals, cap_size, deadline, strategy, session_id):
     triggered = ctx.triggered_id
 
     if triggered == "submit-world":
-        df = get_world_df(cities_df, cap_size)
-        Thread(target=run_weather_fetch, args=(df,get_data_incremental,'world'), daemon=True).start()
+        from utils import get_sample_plan
+        from data_loader import cached_coordinates
+        df = get_sample_plan("world", get_cities_df(), cap_size=cap_size,
+                             prefer=cached_coordinates(), strategy=strategy)
+        start_weather_fetch(df, choose_fetch(deadline), 'world', session_id)
         return 0, dash.no_update, {"display": "block"}, False
 
-    value = int(progress["value"])
-    if value >= 100 and result_df['world'] is not None:
-        return 0, render_world_view(result_df['world']), {"display": "none"}, True
+    if triggered == "show-sweep-world":
+        from sweep import SWEEP_OUTPUT, load_sweep
+        if not os.path.exists(SWEEP_OUTPUT):
+            return 0, html.Div(f"No sweep output at {SWEEP_OUTPUT}. Run `python sweep.py -o {SWEEP_OUTPUT}` first.",
+                               style={"color": "red"}), {"display": "none"}, True
+        start_weather_fetch(None, load_sweep, 'world', session_id)
+        return 0, dash.no_update, {"display": "block"}, False
+
+    result = take_result(session_id, 'world')
+    if result is not None:
+        from views.world_view import render_world_view
+        return 0, render_world_view(result), {"display": "none"}, True
+
+    value = int(progress.get((session_id, 'world'), 0))
 
     if value > 0:
         return value, dash.no_update, {"display": "block"}, False
 
     return 0, dash.no_update, {"display": "none"}, False
 
+# Refresh button inside the rendered world view: only expired points are re-fetched
+# and only the markers and table rows that changed are sent back
+@app.callback(
+    Output("world-map", "figure"),
+    Output("world-table", "data"),
+    Output("refresh-status-world", "children"),
+    Input("refresh-world", "n_clicks"),
+    State("world-map-traces", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+    running=[(Output("refresh-world", "disabled"), True, False)],
+)
+@timed("callback.refresh_world")
+def refresh_world(n_clicks, traces, session_id):
+    df = result_store.get(session_id, 'world')
+    if df is None:
+        return dash.no_update, dash.no_update, "This result has expired, submit again to reload."
+    from data_loader import refresh_observations
+    from views.world_view import patch_world_view
+    with session_context(session_id):
+        refreshed = refresh_observations(df, scope='world_refresh')
+    df, fig_patch, table_patch, changed = patch_world_view(df, refreshed, traces)
+    if changed:
+        result_store.put(session_id, 'world', df)
+    return fig_patch, table_patch, f"Re-fetched {len(refreshed)} of {len(df)} points, {len(changed)} changed."
+
+def apply_lod_view(relayout, lod, session_id, key):
+    """Re-queries the pyramid of a level-of-detail map for its new zoom/viewport."""
+    from views.lod_layer import update_viewport
+    viewport = update_viewport(lod["viewport"], relayout) if lod else None
+    if viewport is None:
+        raise dash.exceptions.PreventUpdate
+    from pyramid import pyramid_cache, get_pyramid
+    from views.lod_layer import lod_patch
+    pyramid = pyramid_cache.get(lod["key"])
+    if pyramid is None:
+        df = result_store.get(session_id, key)
+        if df is None:
+            raise dash.exceptions.PreventUpdate
+        _, pyramid = get_pyramid(df)
+    lod = dict(lod, viewport=viewport)
+    fig_patch, lod["level"], cells = lod_patch(pyramid, lod)
+    increment("lod.cells", cells, scope=key)
+    return fig_patch, lod
+
+# Zoom/pan on a level-of-detail map: only the visible cells of the matching level are sent
+@app.callback(
+    Output("world-map", "figure", allow_duplicate=True),
+    Output("world-map-lod", "data"),
+    Input("world-map", "relayoutData"),
+    State("world-map-lod", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+@timed("callback.lod_world")
+def update_world_lod(relayout, lod, session_id):
+    return apply_lod_view(relayout, lod, session_id, 'world')
+
+@app.callback(
+    Output("continent-map", "figure", allow_duplicate=True),
+    Output("continent-map-lod", "data"),
+    Input("continent-map", "relayoutData"),
+    State("continent-map-lod", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+@timed("callback.lod_continent")
+def update_continent_lod(relayout, lod, session_id):
+    return apply_lod_view(relayout, lod, session_id, 'continent')
+
 #continent tab callback
 @app.callback(
     Output("progress-bar-continent", "value"),
@@ -166,21 +400,30 @@ def handle_world_tab(n_clicks, n_intervals, cap_size):
     Input("progress-interval-continent", "n_intervals"),
     State("dropdown-continent", "value"),
     State("cap-size-continent", "value"),
+    State("deadline-continent", "value"),
+    State("sampling-continent", "value"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def handle_continent_tab(n_clicks, n_intervals, continent, cap_size):
-    global progress, result_df
-
+@timed("callback.handle_continent_tab")
+@profiled("handle_continent_tab")
+def handle_continent_tab(n_clicks, n_intervals, continent, cap_size, deadline, strategy, session_id):
     triggered = ctx.triggered_id
 
     if triggered == "submit-continent":
-        df = get_continent_df(cities_df, continent, cap_size)
-        Thread(target=run_weather_fetch, args=(df,get_data_incremental,'continent'), daemon=True).start()
+        from utils import get_sample_plan
+        from data_loader import cached_coordinates
+        df = get_sample_plan("continent", get_cities_df(), continent, cap_size=cap_size,
+                             prefer=cached_coordinates(), strategy=strategy)
+        start_weather_fetch(df, choose_fetch(deadline), 'continent', session_id)
         return 0, dash.no_update, {"display": "block"}, False
 
-    value = int(progress["value"])
-    if value >= 100 and result_df['continent'] is not None:
-        return 0, render_continent_view(result_df['continent']), {"display": "none"}, True
+    result = take_result(session_id, 'continent')
+    if result is not None:
+        from views.continent_view import render_continent_view
+        return 0, render_continent_view(result), {"display": "none"}, True
+
+    value = int(progress.get((session_id, 'continent'), 0))
 
     if value > 0:
         return value, dash.no_update, {"display": "block"}, False
@@ -197,21 +440,30 @@ def handle_continent_tab(n_clicks, n_intervals, continent, cap_size):
     Input("progress-interval-country", "n_intervals"),
     State("dropdown-country", "value"),
     State("cap-size-country", "value"),
+    State("deadline-country", "value"),
+    State("sampling-country", "value"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def handle_country_tab(n_clicks, n_intervals, country, cap_size):
-    global progress, result_df
-
+@timed("callback.handle_country_tab")
+@profiled("handle_country_tab")
+def handle_country_tab(n_clicks, n_intervals, country, cap_size, deadline, strategy, session_id):
     triggered = ctx.triggered_id
 
     if triggered == "submit-country":
-        df = get_country_df(cities_df, country, cap_size)
-        Thread(target=run_weather_fetch, args=(df,get_data_incremental,'country'), daemon=True).start()
+        from utils import get_sample_plan
+        from data_loader import cached_coordinates
+        df = get_sample_plan("country", get_cities_df(), country, cap_size=cap_size,
+                             prefer=cached_coordinates(), strategy=strategy)
+        start_weather_fetch(df, choose_fetch(deadline), 'country', session_id)
         return 0, dash.no_update, {"display": "block"}, False
 
-    value = int(progress["value"])
-    if value >= 100 and result_df['country'] is not None:
-        return 0, render_country_view(result_df['country']), {"display": "none"}, True
+    result = take_result(session_id, 'country')
+    if result is not None:
+        from views.country_view import render_country_view
+        return 0, render_country_view(result), {"display": "none"}, True
+
+    value = int(progress.get((session_id, 'country'), 0))
 
     if value > 0:
         return value, dash.no_update, {"display": "block"}, False
@@ -225,25 +477,38 @@ def handle_country_tab(n_clicks, n_intervals, country, cap_size):
     Output("progress-wrapper-region", "style"),
     Output("progress-interval-region", "disabled"),
     Input("submit-region", "n_clicks"),
+    Input("submit-forecast-region", "n_clicks"),
     Input("progress-interval-region", "n_intervals"),
     State("country-dropdown-region", "value"),
     State("dropdown-region", "value"),
     State("cap-size-region", "value"),
+    State("deadline-region", "value"),
+    State("sampling-region", "value"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def handle_region_tab(n_clicks, n_intervals, country, region, cap_size):
-    global progress, result_df
-
+@timed("callback.handle_region_tab")
+@profiled("handle_region_tab")
+def handle_region_tab(n_clicks, n_forecast_clicks, n_intervals, country, region, cap_size, deadline, strategy, session_id):
     triggered = ctx.triggered_id
 
-    if triggered == "submit-region":
-        df = get_region_df(cities_df, country, region, cap_size)
-        Thread(target=run_weather_fetch, args=(df,get_data_incremental,'region'), daemon=True).start()
+    if triggered in ("submit-region", "submit-forecast-region"):
+        from utils import get_sample_plan
+        from data_loader import cached_coordinates, get_region_forecasts
+        df = get_sample_plan("region", get_cities_df(), country, region, cap_size=cap_size,
+                             prefer=cached_coordinates(), strategy=strategy)
+        fetch = get_region_forecasts if triggered == "submit-forecast-region" else choose_fetch(deadline)
+        start_weather_fetch(df, fetch, 'region', session_id)
         return 0, dash.no_update, {"display": "block"}, False
 
-    value = int(progress["value"])
-    if value >= 100 and result_df['region'] is not None:
-        return 0, render_region_view(result_df['region']), {"display": "none"}, True
+    result = take_result(session_id, 'region')
+    if result is not None:
+        from views.region_view import render_region_view, render_region_forecast_view
+        # A forecast comparison has a row per city and hour
+        view = render_region_forecast_view if "time_epoch" in result.columns else render_region_view
+        return 0, view(result), {"display": "none"}, True
+
+    value = int(progress.get((session_id, 'region'), 0))
 
     if value > 0:
         return value, dash.no_update, {"display": "block"}, False
@@ -261,21 +526,38 @@ def handle_region_tab(n_clicks, n_intervals, country, region, cap_size):
     State("country-dropdown-city", "value"),
     State("region-dropdown-city", "value"),
     State("dropdown-city", "value"),
+    State("place-search-city", "value"),
+    State("session-id", "data"),
     prevent_initial_call=True,
 )
-def handle_city_tab(n_clicks, n_intervals, country, region, city):
-    global progress, result_df
-
+@timed("callback.handle_city_tab")
+@profiled("handle_city_tab")
+def handle_city_tab(n_clicks, n_intervals, country, region, city, place, session_id):
     triggered = ctx.triggered_id
 
     if triggered == "submit-city":
-        df = get_city_row(cities_df, country, region, city)
-        Thread(target=run_weather_fetch, args=(df,get_city_forecast,'city'), daemon=True).start()
+        if place:
+            from search_index import parse_place_value
+            country, region, city = parse_place_value(place)
+        from utils import get_city_row
+        from data_loader import get_city_forecast, has_cached_forecast
+        df = get_city_row(get_cities_df(), country, region, city)
+        if not df.empty and has_cached_forecast(df["lat"].iat[0], df["lon"].iat[0]):
+            # Prefetched while the user was choosing: render now instead of polling for it
+            from views.city_view import render_city_view
+            result_store.discard(session_id, 'city')
+            progress.pop((session_id, 'city'), None)
+            increment("prefetch.served")
+            return 0, render_city_view(get_city_forecast(df)), {"display": "none"}, True
+        start_weather_fetch(df, get_city_forecast, 'city', session_id)
         return 10, dash.no_update, {"display": "block"}, False
 
-    value = int(progress["value"])
-    if value >= 100 and result_df['city'] is not None:
-        return 10, render_city_view(result_df['city']), {"display": "none"}, True
+    result = take_result(session_id, 'city')
+    if result is not None:
+        from views.city_view import render_city_view
+        return 10, render_city_view(result), {"display": "none"}, True
+
+    value = int(progress.get((session_id, 'city'), 0))
 
     if value > 0:
         return 10, dash.no_update, {"display": "block"}, False
@@ -283,5 +565,30 @@ def handle_city_tab(n_clicks, n_intervals, country, region, city):
     return 0, dash.no_update, {"display": "none"}, False
 
 
+# Picking a city starts its forecast fetch before Submit is clicked (prefetch.py)
+@app.callback(
+    Output("city-prefetch", "data"),
+    Input("dropdown-city", "value"),
+    Input("place-search-city", "value"),
+    State("country-dropdown-city", "value"),
+    State("region-dropdown-city", "value"),
+    State("city-prefetch", "data"),
+    State("session-id", "data"),
+    prevent_initial_call=True,
+)
+@timed("callback.prefetch_city_forecast")
+def prefetch_city_forecast(city, place, country, region, prefetching, session_id):
+    from search_index import parse_place_value, place_value
+    # Same precedence as handle_city_tab: a searched place wins over the cascade
+    selection = place or (place_value(country, region, city) if country and region and city else None)
+    if selection == prefetching:
+        raise dash.exceptions.PreventUpdate  # e.g. the other input was cleared in response
+    points = []
+    if selection:
+        from prefetch import selection_points
+        points = selection_points(get_cities_df(), *parse_place_value(selection))
+    forecast_prefetcher.select(session_id, points)
+    return selection
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,73 @@
+// assets/places.js
+//
+// Client-side dropdown cascade (see place_hierarchy.py). The hierarchy files are
+// fetched once per page from the fingerprinted URLs in the tab's `place-urls`
+// store; after that every option list is a local lookup.
+
+(function () {
+    var loaded = {};
+
+    function load(urls, name) {
+        if (!urls || !urls[name]) {
+            return Promise.resolve(null);
+        }
+        if (!loaded[urls[name]]) {
+            loaded[urls[name]] = fetch(urls[name]).then(function (response) {
+                if (!response.ok) {
+                    delete loaded[urls[name]];
+                    throw new Error("Could not load " + urls[name]);
+                }
+                return response.json();
+            });
+        }
+        return loaded[urls[name]];
+    }
+
+    // Same labels as Python's str.title() on the lowercase names
+    function title(name) {
+        return name.replace(/\p{L}+/gu, function (word) {
+            return word.charAt(0).toUpperCase() + word.slice(1);
+        });
+    }
+
+    // "name@lat,lon" (a name found twice in the region) is labelled "Name (lat, lon)"
+    function label(value) {
+        var parts = value.split("@");
+        return parts.length > 1 ? title(parts[0]) + " (" + parts[1].replace(",", ", ") + ")" : title(value);
+    }
+
+    function options(values) {
+        return (values || []).map(function (value) {
+            return {label: label(value), value: value};
+        });
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        places: {
+            countriesByContinent: function (continent, urls) {
+                if (!continent) {
+                    return [];
+                }
+                return load(urls, "hierarchy").then(function (places) {
+                    return options(places && places.continents[continent]);
+                });
+            },
+            regionsByCountry: function (country, urls) {
+                if (!country) {
+                    return [];
+                }
+                return load(urls, "hierarchy").then(function (places) {
+                    return options(places && places.regions[country]);
+                });
+            },
+            citiesByRegion: function (country, region, urls) {
+                if (!country || !region) {
+                    return [];
+                }
+                return load(urls, "cities").then(function (cities) {
+                    return options(cities && cities[country] && cities[country][region]);
+                });
+            }
+        }
+    });
+})();
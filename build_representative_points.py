@@ -0,0 +1,77 @@
+# build_representative_points.py
+#
+# Builds data/representative_points.csv, the table World and Continent sampling
+# draws from (see data.get_representative_points):
+#
+#   python build_representative_points.py
+#
+# One row per region and one per country, each placed on a real city instead of
+# an averaged centroid (which can land in the sea):
+#   region  -> the region's major city from data/regions.csv, or else the city in
+#              data/cities.csv nearest to the region centroid
+#   country -> the region point nearest to the country centroid
+
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+CITIES_CSV = "data/cities.csv"
+MAJOR_CITIES_CSV = "data/regions.csv"
+REPRESENTATIVE_POINTS_CSV = "data/representative_points.csv"
+
+COLUMNS = ["kind", "continent", "country", "region", "city", "lat", "lon", "source"]
+
+
+def normalize(name):
+    # regions.csv uses title case and accents, cities.csv plain lowercase ascii
+    return unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode().lower().strip()
+
+
+def nearest(candidates, lat, lon):
+    """Row of `candidates` closest to (lat, lon) on the sphere."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(candidates["lat"].to_numpy()), np.radians(candidates["lon"].to_numpy())
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return candidates.iloc[int(np.argmin(a))]
+
+
+def build_representative_points(cities: pd.DataFrame, major_cities: pd.DataFrame) -> pd.DataFrame:
+    major = major_cities.copy()
+    for col in ["city", "region", "country"]:
+        major[col] = major[col].map(normalize)
+    major = major.drop_duplicates(["country", "region"]).set_index(["country", "region"])
+
+    region_avg = cities.groupby(["country", "region"])[["lat", "lon"]].mean()
+    continents = cities.groupby("country")["continent"].first()
+
+    regions = []
+    for (country, region), centroid in region_avg.iterrows():
+        if (country, region) in major.index:
+            city = major.loc[(country, region)]
+            name, lat, lon, source = city["city"], city["lat"], city["lon"], "major_city"
+        else:
+            city = nearest(cities[(cities["country"] == country) & (cities["region"] == region)], centroid["lat"], centroid["lon"])
+            name, lat, lon, source = city["city"], city["lat"], city["lon"], "nearest_city"
+        regions.append(("region", continents[country], country, region, name, lat, lon, source))
+    regions = pd.DataFrame(regions, columns=COLUMNS)
+
+    countries = []
+    for country, centroid in cities.groupby("country")[["lat", "lon"]].mean().iterrows():
+        point = nearest(regions[regions["country"] == country], centroid["lat"], centroid["lon"])
+        countries.append(("country", point["continent"], country, point["region"], point["city"], point["lat"], point["lon"], point["source"]))
+    countries = pd.DataFrame(countries, columns=COLUMNS)
+
+    return pd.concat([countries, regions], ignore_index=True)
+
+
+def main():
+    points = build_representative_points(pd.read_csv(CITIES_CSV), pd.read_csv(MAJOR_CITIES_CSV))
+    points.to_csv(REPRESENTATIVE_POINTS_CSV, index=False)
+    counts = points.groupby(["kind", "source"]).size()
+    print(f"Wrote {len(points)} points to {REPRESENTATIVE_POINTS_CSV}")
+    print(counts.to_string())
+
+
+if __name__ == "__main__":
+    main()
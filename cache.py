@@ -0,0 +1,69 @@
+# cache.py
+#
+# Small thread-safe LRU cache with a time-to-live, shared by the observation cache
+# (data_loader), the sample plan cache (utils) and friends. Hit/miss counts are
+# exposed through stats() for /metrics.
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+def coordinate_key(lat, lon):
+    """Cache key for a point; ~11 m resolution, so centroids and city rows match exactly."""
+    return (round(float(lat), 4), round(float(lon), 4))
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds, maxsize):
+        self.ttl = ttl_seconds
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, stored_at, now):
+        return self.ttl is None or now - stored_at < self.ttl
+
+    def get(self, key):
+        """Returns the cached value, or None if absent or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._fresh(entry[0], now):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def fresh_keys(self):
+        """Snapshot of the keys that have not expired."""
+        now = time.time()
+        with self._lock:
+            return {key for key, (stored_at, _) in self._entries.items() if self._fresh(stored_at, now)}
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self._fresh(entry[0], time.time())
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
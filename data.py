@@ -1,3 +1,28 @@
-import pandas as pd
+from functools import lru_cache
 
-cities_df = pd.read_csv('data/cities.csv')
\ No newline at end of file
+CITIES_CSV = 'data/cities.csv'
+REPRESENTATIVE_POINTS_CSV = 'data/representative_points.csv'
+
+@lru_cache(maxsize=None)
+def get_cities_df():
+    # pandas and the 33k-row CSV are only loaded the first time a caller needs them,
+    # so importing the app (and opening the World tab) stays cheap
+    import pandas as pd
+    return pd.read_csv(CITIES_CSV)
+
+@lru_cache(maxsize=None)
+def get_representative_points():
+    # One on-land point per country and per region, used by World/Continent sampling.
+    # Precomputed by build_representative_points.py; rebuilt in memory if the file is missing.
+    import os
+    import pandas as pd
+    if os.path.exists(REPRESENTATIVE_POINTS_CSV):
+        return pd.read_csv(REPRESENTATIVE_POINTS_CSV)
+    from build_representative_points import build_representative_points, MAJOR_CITIES_CSV
+    return build_representative_points(get_cities_df(), pd.read_csv(MAJOR_CITIES_CSV))
+
+def __getattr__(name):
+    # Keeps `from data import cities_df` working for scripts, still parsed lazily
+    if name == "cities_df":
+        return get_cities_df()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,47 @@
 import requests
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from contextvars import copy_context
 from datetime import date
+from functools import lru_cache
+import logging
 import os
+import time
+from threading import Event, Lock
+from metrics import timed, increment
+from cache import TTLCache, coordinate_key
+from scheduler import request_scheduler
+
+logger = logging.getLogger(__name__)
 
 API_KEY = os.getenv("API_KEY")
 BASE_URL_CURRENT = os.getenv("BASE_URL_CURRENT")
 BASE_URL_FORECAST = os.getenv("BASE_URL_FORECAST")
+# (connect, read) timeouts for each API request, in seconds
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT_SECONDS", "3.05")),
+               float(os.getenv("API_READ_TIMEOUT_SECONDS", "10")))
+
+# Current conditions per coordinate, reused by any scope that samples the same point
+OBSERVATION_TTL_MINUTES = float(os.getenv("OBSERVATION_TTL_MINUTES", "15"))
+OBSERVATION_CACHE_SIZE = int(os.getenv("OBSERVATION_CACHE_SIZE", "20000"))
+observation_cache = TTLCache(OBSERVATION_TTL_MINUTES * 60, OBSERVATION_CACHE_SIZE)
+
+# Deadline mode: default time budget in seconds (0 = off) and requests in flight per job
+FETCH_DEADLINE_SECONDS = float(os.getenv("FETCH_DEADLINE_SECONDS", "0"))
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+# Scope of the points fetched after a job's deadline; bulk priority in the scheduler
+BACKGROUND_SCOPE = "background"
+
+# Hourly forecasts per coordinate, shared by the City tab and the Region forecast comparison
+FORECAST_TTL_MINUTES = float(os.getenv("FORECAST_TTL_MINUTES", "60"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "500"))
+FORECAST_CONCURRENCY = int(os.getenv("FORECAST_CONCURRENCY", "10"))
+forecast_cache = TTLCache(FORECAST_TTL_MINUTES * 60, FORECAST_CACHE_SIZE)
+# coordinate key -> Event set when the request for it finishes; concurrent callers
+# (a Submit racing its prefetch, see prefetch.py) wait for it instead of repeating it
+forecast_in_flight = {}
+forecast_in_flight_lock = Lock()
 
 def get_continents(df):
     return list(df['continent'].unique())
@@ -32,6 +67,7 @@ def get_cities_by_region(df, selected_country, selected_region):
     cities = sorted(df[np.logical_and(df["country"] == selected_country, df['region'] == selected_region)]["city"].unique())
     return [{"label": c.title(), "value": c} for c in cities]
 
+@timed("extract.current")
 def extract_row(data):
     new_data = {
         "city":data['location']['name'],
@@ -71,6 +107,7 @@ def extract_row(data):
     }
     return new_data
 
+@timed("extract.forecast")
 def extract_hourly_forecast(json_data):
     hours_data = []
 
@@ -122,67 +159,240 @@ def extract_hourly_forecast(json_data):
     df = pd.DataFrame(hours_data)
     return df
 
-def get_city_forecast(df_city_info, step_callback=None): # Renamed df to df_city_info for clarity
-    if df_city_info.empty:
+@lru_cache(maxsize=1)
+def api_session():
+    """One keep-alive session per process for API requests, a connection per scheduler slot."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=request_scheduler.max_concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def cached_forecast(key, scope=None):
+    cached = forecast_cache.get(key)
+    if cached is None:
         return None
+    increment("cache.forecasts.hits", scope=scope)
+    weather_df, location_data = cached
+    return weather_df.copy(), location_data
 
-    # Get lat/lon from the provided df_city_info (which should be from get_data_incremental or similar)
-    lat = df_city_info.iloc[0]['lat']
-    lon = df_city_info.iloc[0]['lon']
+def has_cached_forecast(lat, lon):
+    return forecast_cache.get(coordinate_key(lat, lon)) is not None
 
-    url = f"{BASE_URL_FORECAST}?key={API_KEY}&q={lat},{lon}&days=3"
+def fetch_forecast(lat, lon, scope=None):
+    """Hourly forecast frame and the API's location for one point, cached per coordinate.
+
+    Returns (None, None) on failure.
+    """
+    key = coordinate_key(lat, lon)
+    cached = cached_forecast(key, scope)
+    if cached is not None:
+        return cached
 
+    with forecast_in_flight_lock:
+        pending = forecast_in_flight.get(key)
+        if pending is None:
+            forecast_in_flight[key] = Event()
+    if pending is not None:
+        # Someone is already fetching this point: take their result (or fetch if they failed)
+        pending.wait(timeout=30)
+        cached = cached_forecast(key, scope)
+        if cached is not None:
+            increment("cache.forecasts.joined", scope=scope)
+            return cached
+        return fetch_forecast_uncached(lat, lon, key, scope)
+    try:
+        return fetch_forecast_uncached(lat, lon, key, scope)
+    finally:
+        with forecast_in_flight_lock:
+            forecast_in_flight.pop(key).set()
+
+def fetch_forecast_uncached(lat, lon, key, scope=None):
+    increment("cache.forecasts.misses", scope=scope)
+    url = f"{BASE_URL_FORECAST}?key={API_KEY}&q={lat},{lon}&days=3"
     try:
-        response = requests.get(url)
+        with request_scheduler.slot(scope), timed("api.forecast"):
+            response = api_session().get(url, timeout=API_TIMEOUT)
+        record_api_call(response, scope)
         response.raise_for_status()
         weather_data = response.json()
         weather_df = extract_hourly_forecast(weather_data)
-
-        # --- IMPORTANT ADDITION ---
-        # Extract location details from the forecast API response itself
         location_data = weather_data.get('location', {})
-        location_lat = location_data.get('lat')
-        location_lon = location_data.get('lon')
-        city_name = location_data.get('name')
-        country_name = location_data.get('country')
-        region_name = location_data.get('region')
-
-        # Add these details as new columns to the hourly forecast DataFrame
-        # This makes them available for render_city_view
-        weather_df['lat'] = location_lat
-        weather_df['lon'] = location_lon
-        weather_df['city'] = city_name
-        weather_df['country'] = country_name
-        weather_df['region'] = region_name
-        # --- END IMPORTANT ADDITION ---
-
     except Exception as e:
-        print(f"Error fetching city forecast data: {e}")
+        increment("api.errors", scope=scope)
+        logger.warning("Error fetching forecast for %s,%s: %s", lat, lon, e)
+        return None, None
+
+    forecast_cache.set(key, (weather_df, location_data))
+    return weather_df.copy(), location_data
+
+def get_city_forecast(df_city_info, step_callback=None, scope="city"): # Renamed df to df_city_info for clarity
+    if df_city_info.empty:
         return None
 
+    # Get lat/lon from the provided df_city_info (which should be from get_data_incremental or similar)
+    lat = df_city_info.iloc[0]['lat']
+    lon = df_city_info.iloc[0]['lon']
+
+    weather_df, location_data = fetch_forecast(lat, lon, scope=scope)
+    if weather_df is None:
+        return None
+
+    # --- IMPORTANT ADDITION ---
+    # Extract location details from the forecast API response itself
+    # and add them as new columns to the hourly forecast DataFrame.
+    # This makes them available for render_city_view
+    weather_df['lat'] = location_data.get('lat')
+    weather_df['lon'] = location_data.get('lon')
+    weather_df['city'] = location_data.get('name')
+    weather_df['country'] = location_data.get('country')
+    weather_df['region'] = location_data.get('region')
+    # --- END IMPORTANT ADDITION ---
+
     if step_callback:
         step_callback(100)
 
     return weather_df # This DataFrame now includes 'lat', 'lon', 'city', 'country', 'region'
 
-def get_data_incremental(df, step_callback=None):
+def get_region_forecasts(df, step_callback=None, scope="region_forecast"):
+    """Hourly forecasts for every point of a sample, fetched concurrently.
+
+    Returns one long-format frame (a row per city and hour) with the sample's
+    city/region/country/lat/lon alongside the extract_hourly_forecast columns.
+    Cached forecasts are reused, so only the missing points cost a request.
+    """
+    total = len(df)
+    if total == 0:
+        return None
+
+    frames = []
+    with ThreadPoolExecutor(max_workers=FORECAST_CONCURRENCY, thread_name_prefix=f"forecast-{scope}") as pool:
+        # copy_context carries the session over to the scheduler (see scheduler.py)
+        futures = {pool.submit(copy_context().run, fetch_forecast, row.lat, row.lon, scope): row for row in df.itertuples()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            weather_df, _ = future.result()
+            if weather_df is not None:
+                row = futures[future]
+                frames.append(weather_df.assign(city=row.city, region=row.region, country=row.country, lat=row.lat, lon=row.lon))
+            if step_callback:
+                # The bar must not hit 100 before the frame is assembled
+                step_callback(min(done / total * 100, 99))
+
+    result = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if step_callback:
+        step_callback(100)
+    return result
+
+def record_api_call(response, scope):
+    increment("api.calls", scope=scope)
+    increment("api.bytes", len(response.content), scope=scope)
+    if response.status_code != 200:
+        increment("api.errors", scope=scope)
+
+def cached_coordinates():
+    """Coordinate keys with a fresh cached observation (input for cache-aware sampling)."""
+    return observation_cache.fresh_keys()
+
+def fetch_current(lat, lon, scope=None):
+    """Fetches and extracts current conditions for one point; None on failure."""
+    key = coordinate_key(lat, lon)
+    cached = observation_cache.get(key)
+    if cached is not None:
+        increment("cache.observations.hits", scope=scope)
+        return dict(cached)
+    increment("cache.observations.misses", scope=scope)
+
+    url = f"{BASE_URL_CURRENT}?key={API_KEY}&q={lat},{lon}"
+    try:
+        with request_scheduler.slot(scope), timed("api.current"):
+            response = api_session().get(url, timeout=API_TIMEOUT)
+        record_api_call(response, scope)
+        if response.status_code == 200:
+            row = extract_row(response.json())
+            observation_cache.set(key, row)
+            # Also under the location the API resolved to, which is what a result row
+            # carries, so refresh_observations can tell fresh rows from stale ones
+            observation_cache.set(coordinate_key(row["lat"], row["lon"]), row)
+            return dict(row)
+    except Exception as e:
+        increment("api.errors", scope=scope)
+        logger.warning("Error fetching current weather for %s,%s: %s", lat, lon, e)
+    return None
+
+def get_data_incremental(df, step_callback=None, scope=None):
     data = []
     total = len(df)
 
     for i, row in df.iterrows():
-        lat = row['lat']
-        lon = row['lon']
-        url = f"{BASE_URL_CURRENT}?key={API_KEY}&q={lat},{lon}"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                weather_data = response.json()
-                processed = extract_row(weather_data)
-                data.append(processed)
-        except Exception as e:
-            print(e)
+        processed = fetch_current(row['lat'], row['lon'], scope=scope)
+        if processed is not None:
+            data.append(processed)
 
         if step_callback:
             step_callback((i + 1) / total * 100)
 
-    return pd.DataFrame(data)
\ No newline at end of file
+    return pd.DataFrame(data)
+
+def refresh_observations(df, scope=None):
+    """Re-fetches the rows of a displayed result whose cached observation has expired.
+
+    Rows are identified by their own lat/lon. Returns {row position: new row} for the
+    re-fetched rows (coordinates kept as displayed); fresh rows cost nothing.
+    """
+    fresh = cached_coordinates()
+    stale = [i for i, (lat, lon) in enumerate(zip(df["lat"], df["lon"])) if coordinate_key(lat, lon) not in fresh]
+    increment("refresh.stale", len(stale), scope=scope)
+    if not stale:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY, thread_name_prefix=f"refresh-{scope}") as pool:
+        futures = [pool.submit(copy_context().run, fetch_current, df["lat"].iat[i], df["lon"].iat[i], scope) for i in stale]
+        refreshed = {i: f.result() for i, f in zip(stale, futures) if f.result() is not None}
+    for i, row in refreshed.items():
+        row["lat"], row["lon"] = df["lat"].iat[i], df["lon"].iat[i]
+    return refreshed
+
+def get_data_within_deadline(df, deadline_seconds, step_callback=None, scope=None):
+    """Like get_data_incremental, but returns after `deadline_seconds` with whatever has arrived.
+
+    Points are fetched in plan order (country points first for world/continent), so a
+    partial result is the highest-priority subset. Points still pending at the deadline
+    keep being fetched in the background (at most FETCH_CONCURRENCY at a time, at bulk
+    priority as scope BACKGROUND_SCOPE) and land in the observation cache for the next
+    run. A partial result carries attrs["partial"] = {"fetched": n, "total": m}.
+    """
+    started = time.monotonic()
+    total = len(df)
+    deadline_passed = Event()
+
+    def fetch(lat, lon):
+        # Past the deadline nobody is waiting for this point: yield to interactive requests
+        return fetch_current(lat, lon, scope=BACKGROUND_SCOPE if deadline_passed.is_set() else scope)
+
+    pool = ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY, thread_name_prefix=f"fetch-{scope}")
+    futures = [pool.submit(copy_context().run, fetch, row.lat, row.lon) for row in df.itertuples()]
+    # Don't block on the leftovers; the pool's threads drain them and then exit
+    pool.shutdown(wait=False)
+
+    pending = set(futures)
+    while pending:
+        remaining = deadline_seconds - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        _, pending = wait(pending, timeout=min(remaining, 0.25))
+        if step_callback:
+            done_share = (total - len(pending)) / total
+            time_share = (time.monotonic() - started) / deadline_seconds
+            # The bar must not hit 100 before the result is ready
+            step_callback(min(max(done_share, time_share) * 100, 99))
+    deadline_passed.set()
+
+    data = [f.result() for f in futures if f.done() and f.result() is not None]
+    result = pd.DataFrame(data)
+    if pending:
+        increment("fetch.deadline_partial", scope=scope)
+        result.attrs["partial"] = {"fetched": total - len(pending), "total": total}
+
+    if step_callback:
+        step_callback(100)
+    return result
@@ -0,0 +1,253 @@
+# export.py
+#
+# Headless snapshot export: sample a scope the same way the dashboard does, fetch
+# current conditions for every point and stream the rows to CSV or Parquet.
+#
+#   python export.py world --cap-size 400 -o exports/world.csv
+#   python export.py continent --continent europe --concurrency 8 -o exports/europe.parquet
+#   python export.py country --country france --cap-size 200 -o exports/france.csv
+#   python export.py region --country france --region ile-de-france -o exports/idf.csv
+#
+# Progress is checkpointed in <output>.checkpoint/ (the sampled points and the ones
+# already fetched). Re-running the same command after an interruption resumes where
+# it stopped without refetching; pass --fresh to start over.
+
+import argparse
+import csv
+import importlib.util
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from threading import Lock
+
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+
+import pandas as pd
+
+from data import get_cities_df
+from data_loader import fetch_current
+from utils import get_world_df, get_continent_df, get_country_df, get_region_df, get_coverage_df
+from sampling import SAMPLING_STRATEGIES, SAMPLING_STRATEGY
+
+
+def build_plan(args, cities):
+    """The points to fetch, sampled with the same functions the dashboard uses."""
+    if args.sampling == "coverage":
+        selection = {"continent": [args.continent], "country": [args.country], "region": [args.country, args.region]}
+        return get_coverage_df(cities, args.scope, *selection.get(args.scope, []), cap_size=args.cap_size)
+    if args.scope == "world":
+        return get_world_df(args.cap_size)
+    if args.scope == "continent":
+        return get_continent_df(args.continent, args.cap_size)
+    if args.scope == "country":
+        return get_country_df(cities, args.country, args.cap_size)
+    return get_region_df(cities, args.country, args.region, args.cap_size)
+
+
+class Checkpoint:
+    """<output>.checkpoint/: plan.csv (points to fetch) + done.log (one plan index per line)."""
+
+    def __init__(self, output):
+        self.path = f"{output}.checkpoint"
+        self.plan_path = os.path.join(self.path, "plan.csv")
+        self.done_path = os.path.join(self.path, "done.log")
+        self.spool_path = os.path.join(self.path, "rows.csv")
+
+    def exists(self):
+        return os.path.exists(self.plan_path)
+
+    def create(self, plan):
+        os.makedirs(self.path, exist_ok=True)
+        plan[["lat", "lon"]].to_csv(self.plan_path, index_label="point")
+        open(self.done_path, "w").close()
+
+    def load_plan(self):
+        return pd.read_csv(self.plan_path, index_col="point")
+
+    def done(self):
+        with open(self.done_path) as f:
+            return {int(line) for line in f if line.strip()}
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class RowWriter:
+    """Appends rows to a CSV and marks their plan index done, flushing both per row."""
+
+    def __init__(self, path, done_path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="")
+        self._done = open(done_path, "a")
+        self._writer = None
+        self._write_header = new_file
+        self._lock = Lock()
+        self.rows = 0
+
+    def write(self, point, row):
+        with self._lock:
+            if self._writer is None:
+                self._writer = csv.DictWriter(self._file, fieldnames=list(row.keys()))
+                if self._write_header:
+                    self._writer.writeheader()
+            self._writer.writerow(row)
+            self._file.flush()
+            self._done.write(f"{point}\n")
+            self._done.flush()
+            self.rows += 1
+
+    def close(self):
+        self._file.close()
+        self._done.close()
+
+
+def check_parquet(parser, fmt):
+    """Stops at argument parsing, not after the whole fetch, when Parquet can't be written."""
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        parser.error("Parquet output needs pyarrow: pip install pyarrow")
+
+
+# Column types of the spooled rows (data_loader.extract_row); every other column is a float.
+# Fixed up front, so a chunk or shard whose column is all empty still gets the same schema.
+SPOOL_TEXT_COLUMNS = {"city", "region", "country", "date", "condition_text", "condition_icon", "wind_dir"}
+SPOOL_INT_COLUMNS = {"is_day", "wind_degree", "humidity", "cloud"}
+
+
+def spool_dtypes(columns):
+    """{column: pandas dtype} for reading a spool; nullable, so missing values keep the type."""
+    return {
+        col: "string" if col in SPOOL_TEXT_COLUMNS else "Int64" if col in SPOOL_INT_COLUMNS else "float64"
+        for col in columns
+    }
+
+
+def spool_to_parquet(spool_path, output, chunksize=50_000):
+    """Converts the CSV spool (or several, in order) to Parquet one chunk (row group) at a time."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+
+    arrow_types = {"string": pa.string(), "Int64": pa.int64(), "float64": pa.float64()}
+    spool_paths = [spool_path] if isinstance(spool_path, str) else spool_path
+    writer = None
+    for path in spool_paths:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            continue
+        with open(path, newline="") as f:
+            dtypes = spool_dtypes(next(csv.reader(f)))
+        schema = pa.schema([(col, arrow_types[dtype]) for col, dtype in dtypes.items()])
+        if writer is None:
+            writer = pq.ParquetWriter(output, schema)
+        elif schema != writer.schema:
+            raise ValueError(f"{path} has columns {schema.names}, expected {writer.schema.names}")
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=dtypes):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    if writer is not None:
+        writer.close()
+
+
+def fetch_all(points, writer, scope, concurrency, log_every=25, fetch=fetch_current, label=""):
+    """Fetches points with up to `concurrency` requests in flight; returns failed count."""
+    failed = 0
+    total = len(points)
+    started = time.perf_counter()
+    pending = iter(points.itertuples())
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+
+        def submit_next():
+            for point in pending:
+                in_flight[pool.submit(fetch, point.lat, point.lon, scope)] = point.Index
+                return
+
+        for _ in range(concurrency * 2):
+            submit_next()
+
+        finished = 0
+        while in_flight:
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                point = in_flight.pop(future)
+                row = future.result()
+                if row is None:
+                    failed += 1
+                else:
+                    writer.write(point, row)
+                finished += 1
+                if finished % log_every == 0 or finished == total:
+                    rate = finished / (time.perf_counter() - started)
+                    print(f"  {label}{finished}/{total} points ({rate:.1f}/s)", file=sys.stderr)
+                submit_next()
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a weather snapshot for a scope to CSV/Parquet.")
+    parser.add_argument("scope", choices=["world", "continent", "country", "region"])
+    parser.add_argument("--continent", help="continent (scope=continent)")
+    parser.add_argument("--country", help="country (scope=country/region)")
+    parser.add_argument("--region", help="region (scope=region)")
+    parser.add_argument("--cap-size", type=int, default=400, help="number of points to sample")
+    parser.add_argument("--sampling", choices=list(SAMPLING_STRATEGIES), default=SAMPLING_STRATEGY,
+                        help="round-robin by region, or farthest-point for even coverage")
+    parser.add_argument("-o", "--output", required=True, help="output file (.csv or .parquet)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the output extension")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight")
+    parser.add_argument("--fresh", action="store_true", help="ignore any checkpoint and start over")
+    args = parser.parse_args(argv)
+
+    required = {"continent": ["continent"], "country": ["country"], "region": ["country", "region"]}
+    for name in required.get(args.scope, []):
+        if not getattr(args, name):
+            parser.error(f"--{name} is required for scope '{args.scope}'")
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    check_parquet(parser, fmt)
+
+    checkpoint = Checkpoint(args.output)
+    if args.fresh:
+        checkpoint.remove()
+        if os.path.exists(args.output):
+            os.remove(args.output)
+
+    if checkpoint.exists():
+        plan = checkpoint.load_plan()
+        done = checkpoint.done()
+        print(f"Resuming: {len(done)}/{len(plan)} points already fetched", file=sys.stderr)
+    else:
+        plan = build_plan(args, get_cities_df()).reset_index(drop=True)
+        if os.path.exists(args.output) and fmt == "csv":
+            os.remove(args.output)  # a finished export from an earlier run
+        checkpoint.create(plan)
+        done = set()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    rows_path = args.output if fmt == "csv" else checkpoint.spool_path
+    writer = RowWriter(rows_path, checkpoint.done_path)
+    started = time.perf_counter()
+    try:
+        failed = fetch_all(plan[~plan.index.isin(done)], writer, args.scope, args.concurrency)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Fetched {writer.rows} points in {elapsed:.1f}s, {failed} failed", file=sys.stderr)
+    if failed:
+        print(f"Re-run the same command to retry failed points (checkpoint: {checkpoint.path})", file=sys.stderr)
+        return 1
+
+    if fmt == "parquet":
+        spool_to_parquet(checkpoint.spool_path, args.output)
+    checkpoint.remove()
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# fake_weather_api.py
+#
+# Local stand-in for WeatherAPI (current.json / forecast.json) for load tests and
+# offline development. Responses have the same shape as the real API; values are
+# synthetic but deterministic per coordinate.
+#
+#   python fake_weather_api.py --port 8051 --latency-ms 150
+#
+# then point the dashboard at it:
+#   BASE_URL_CURRENT=http://127.0.0.1:8051/v1/current.json
+#   BASE_URL_FORECAST=http://127.0.0.1:8051/v1/forecast.json
+
+import argparse
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask, abort, jsonify, request
+
+
+def conditions(lat, lon, hour_offset=0):
+    """Plausible current conditions for a point, stable for a given coordinate."""
+    rng = random.Random(f"{lat:.3f},{lon:.3f},{hour_offset}")
+    temp_c = round(30 - abs(lat) * 0.55 + 6 * math.sin(hour_offset / 24 * 2 * math.pi) + rng.uniform(-3, 3), 1)
+    wind_kph = round(rng.uniform(0, 40), 1)
+    pressure_mb = round(rng.uniform(990, 1030), 1)
+    precip_mm = round(max(rng.gauss(0, 1.5), 0), 1)
+    vis_km = round(rng.uniform(2, 10), 1)
+    gust_kph = round(wind_kph * rng.uniform(1.1, 1.6), 1)
+    dewpoint_c = round(temp_c - rng.uniform(2, 15), 1)
+    f = lambda c: round(c * 9 / 5 + 32, 1)
+    is_day = int(6 <= (datetime.utcnow().hour + lon / 15 + hour_offset) % 24 < 18)
+    return {
+        "temp_c": temp_c, "temp_f": f(temp_c),
+        "is_day": is_day,
+        "condition": {"text": "Sunny" if is_day else "Clear", "icon": f"//cdn.weatherapi.com/weather/64x64/{'day' if is_day else 'night'}/113.png", "code": 1000},
+        "wind_mph": round(wind_kph * 0.621371, 1), "wind_kph": wind_kph,
+        "wind_degree": rng.randint(0, 359), "wind_dir": rng.choice(["N", "NE", "E", "SE", "S", "SW", "W", "NW"]),
+        "pressure_mb": pressure_mb, "pressure_in": round(pressure_mb * 0.02953, 2),
+        "precip_mm": precip_mm, "precip_in": round(precip_mm * 0.0393701, 2),
+        "humidity": rng.randint(10, 100), "cloud": rng.randint(0, 100),
+        "feelslike_c": temp_c, "feelslike_f": f(temp_c),
+        "windchill_c": temp_c, "windchill_f": f(temp_c),
+        "heatindex_c": temp_c, "heatindex_f": f(temp_c),
+        "dewpoint_c": dewpoint_c, "dewpoint_f": f(dewpoint_c),
+        "vis_km": vis_km, "vis_miles": round(vis_km * 0.621371, 1),
+        "uv": round(rng.uniform(0, 11), 1),
+        "gust_mph": round(gust_kph * 0.621371, 1), "gust_kph": gust_kph,
+    }
+
+
+def location(lat, lon):
+    return {"name": f"Point {lat:.2f},{lon:.2f}", "region": "", "country": "Nowhere", "lat": lat, "lon": lon}
+
+
+def create_app(latency_ms=0.0, jitter_ms=0.0, error_rate=0.0):
+    server = Flask(__name__)
+
+    def parse_query():
+        time.sleep(max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0) / 1000)
+        if random.random() < error_rate:
+            abort(503)
+        try:
+            lat, lon = (float(v) for v in request.args["q"].split(","))
+        except (KeyError, ValueError):
+            abort(400)
+        return lat, lon
+
+    @server.route("/v1/current.json")
+    def current():
+        lat, lon = parse_query()
+        return jsonify({"location": location(lat, lon), "current": conditions(lat, lon)})
+
+    @server.route("/v1/forecast.json")
+    def forecast():
+        lat, lon = parse_query()
+        days = int(request.args.get("days", 3))
+        start = datetime.combine(date.today(), datetime.min.time())
+        forecastday = []
+        for d in range(days):
+            hours = []
+            for h in range(24):
+                moment = start + timedelta(days=d, hours=h)
+                hour = conditions(lat, lon, d * 24 + h)
+                hour.update({
+                    "time_epoch": int(moment.timestamp()), "time": moment.strftime("%Y-%m-%d %H:%M"),
+                    "will_it_rain": int(hour["precip_mm"] > 0), "chance_of_rain": 80 if hour["precip_mm"] > 0 else 5,
+                    "will_it_snow": 0, "chance_of_snow": 0,
+                })
+                hours.append(hour)
+            forecastday.append({"date": (start + timedelta(days=d)).strftime("%Y-%m-%d"), "hour": hours})
+        return jsonify({"location": location(lat, lon), "forecast": {"forecastday": forecastday}})
+
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local WeatherAPI stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument("--latency-ms", type=float, default=150, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="uniform +/- jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    args = parser.parse_args()
+    create_app(args.latency_ms, args.jitter_ms, args.error_rate).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# fetch_topojson.py
+#
+# Downloads the plotly base maps the geo views use into TOPOJSON_DIR, so the app can
+# serve them itself (see geo_assets.py):
+#
+#   python fetch_topojson.py
+#   python fetch_topojson.py --source https://mirror.example.com/plotly/un/
+#
+# Run it once on a machine with internet access; restart the app afterwards.
+
+import argparse
+import json
+import os
+import sys
+
+import requests
+
+from geo_assets import TOPOJSON_DIR, TOPOJSON_FILES
+
+TOPOJSON_SOURCE = os.getenv("TOPOJSON_SOURCE", "https://cdn.plot.ly/un/")
+
+
+def fetch(source, name, timeout=30):
+    url = f"{source.rstrip('/')}/{name}.json"
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    # A proxy error page would otherwise be served to every map as the base map
+    if "objects" not in json.loads(response.content):
+        raise ValueError(f"{url} is not a topojson file")
+    return response.content
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the plotly geo base maps for local serving.")
+    parser.add_argument("--source", default=TOPOJSON_SOURCE, help="base URL holding <name>.json")
+    parser.add_argument("--dir", default=TOPOJSON_DIR, help="destination directory")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.dir, exist_ok=True)
+    for name in TOPOJSON_FILES:
+        body = fetch(args.source, name)
+        path = os.path.join(args.dir, f"{name}.json")
+        with open(path, "wb") as f:
+            f.write(body)
+        print(f"Wrote {path} ({len(body) / 1024:.0f} KB)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
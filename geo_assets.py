@@ -0,0 +1,79 @@
+# geo_assets.py
+#
+# Base maps for the scatter_geo views, served by the app instead of cdn.plot.ly.
+# plotly.js downloads <topojsonURL><scope>_<resolution>m.json on a geo map's first
+# render: world_110m (World tab) or world_50m (every view with resolution=50).
+# The files live in TOPOJSON_DIR (fetch them once with `python fetch_topojson.py`)
+# and are served as
+#
+#   /topojson/<digest>/world_50m.json
+#
+# plotly.js appends the file name itself, so the content hash is part of the path
+# rather than a ?v= query. The app refuses to start without the files (check_topojson_files),
+# unless TOPOJSON_CDN_FALLBACK=1 lets the maps fall back to the CDN.
+
+import hashlib
+import os
+from functools import lru_cache
+
+from flask import Response, abort
+
+from http_cache import ASSET_MAX_AGE
+
+TOPOJSON_DIR = os.getenv("TOPOJSON_DIR", "data/topojson")
+TOPOJSON_FILES = ("world_110m", "world_50m")
+TOPOJSON_PATH = "/topojson"
+TOPOJSON_CDN_FALLBACK = os.getenv("TOPOJSON_CDN_FALLBACK", "0") == "1"
+
+
+@lru_cache(maxsize=None)
+def topojson_files():
+    """({name: body}, digest) of the local topojson files; empty when any is missing."""
+    paths = {name: os.path.join(TOPOJSON_DIR, f"{name}.json") for name in TOPOJSON_FILES}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return {}, None
+    files = {}
+    digest = hashlib.sha1()
+    for name, path in paths.items():
+        with open(path, "rb") as f:
+            files[name] = f.read()
+        digest.update(files[name])
+    return files, digest.hexdigest()[:12]
+
+
+def check_topojson_files():
+    """Raises at startup when the base maps are missing, instead of silently using the CDN."""
+    if topojson_files()[1] or TOPOJSON_CDN_FALLBACK:
+        return
+    missing = [name for name in TOPOJSON_FILES if not os.path.exists(os.path.join(TOPOJSON_DIR, f"{name}.json"))]
+    raise RuntimeError(
+        f"Missing geo base maps in {TOPOJSON_DIR}: {', '.join(missing)}. Run `python fetch_topojson.py` "
+        "(part of the install), or set TOPOJSON_CDN_FALLBACK=1 to load them from cdn.plot.ly."
+    )
+
+
+def topojson_url():
+    """Base URL for the `topojsonURL` graph config, or None to use the plotly CDN."""
+    _, digest = topojson_files()
+    return f"{TOPOJSON_PATH}/{digest}/" if digest else None
+
+
+def geo_graph_config():
+    """dcc.Graph config for maps: base maps from this server when available."""
+    url = topojson_url()
+    return {"topojsonURL": url} if url else {}
+
+
+def register_topojson_endpoint(server):
+    @server.route(f"{TOPOJSON_PATH}/<version>/<name>.json")
+    def topojson(version, name):
+        files, digest = topojson_files()
+        if name not in files:
+            abort(404)
+        response = Response(files[name], mimetype="application/json")
+        if version == digest:
+            # A new version gets a new path, so this one never changes
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        return response
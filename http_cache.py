@@ -0,0 +1,119 @@
+# http_cache.py
+#
+# Compression and HTTP caching for the Flask server behind dash.Dash:
+#   * gzip, or brotli when the optional `brotli` package is installed, for text
+#     responses of at least COMPRESS_MIN_BYTES; static bundles are compressed once
+#   * asset_url(): content-fingerprinted /assets/ URLs, served with a far-future
+#     immutable Cache-Control, like Dash's own fingerprinted bundles (plotly.js included)
+#   * ETag / If-None-Match for GET responses (callbacks are POSTs, which dash-renderer
+#     never sends conditionally; large option lists are GET files, see place_hierarchy.py)
+
+import gzip
+import hashlib
+import os
+from functools import lru_cache
+
+from dash.fingerprint import check_fingerprint
+from flask import request
+
+from cache import TTLCache
+from metrics import increment
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+STATIC_PREFIXES = ("/assets/", "/_dash-component-suites/", "/topojson/")
+
+# (path, etag, encoding) -> compressed body, for static files only
+compressed_static_cache = TTLCache(ttl_seconds=None, maxsize=64)
+
+
+@lru_cache(maxsize=None)
+def _file_digest(path, mtime):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+
+def asset_url(app, filename):
+    """app.get_asset_url with a content hash appended, so the file can be cached forever."""
+    path = os.path.join(app.config.assets_folder, filename)
+    return f"{app.get_asset_url(filename)}?v={_file_digest(path, os.path.getmtime(path))}"
+
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+def is_compressible(response):
+    return (
+        response.status_code == 200
+        and "Content-Encoding" not in response.headers
+        and "Content-Range" not in response.headers
+        and (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def compress_response(response):
+    encoding = choose_encoding()
+    response.vary.add("Accept-Encoding")
+    if encoding is None or not is_compressible(response):
+        return response
+
+    static = request.path.startswith(STATIC_PREFIXES)
+    if static:
+        response.direct_passthrough = False  # send_file streams; read it so it can be compressed
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    etag, weak = response.get_etag()
+    key = (request.full_path, etag, encoding)
+    compressed = compressed_static_cache.get(key) if static else None
+    if compressed is None:
+        compressed = compress(data, encoding)
+        if static:
+            compressed_static_cache.set(key, compressed)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    if etag and not weak:
+        response.set_etag(etag, weak=True)  # the bytes differ from the identity encoding
+    increment("http.bytes.uncompressed", len(data))
+    increment("http.bytes.sent", len(compressed))
+    return response
+
+
+def register_http_caching(server):
+    @server.after_request
+    def apply_http_caching(response):
+        if request.method == "GET" and request.path.startswith("/assets/") and "v" in request.args:
+            # Fingerprinted by asset_url(): a new version gets a new URL
+            response.cache_control.no_cache = None  # set by send_file
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        elif (request.method == "GET" and request.path.startswith("/_dash-component-suites/")
+              and check_fingerprint(request.path)[1]):
+            # Dash already gives fingerprinted bundles a one year max-age; they never change either
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        elif request.method == "GET" and response.status_code == 200 and not response.get_etag()[0]:
+            response.add_etag()
+            response.make_conditional(request)
+        return compress_response(response)
@@ -0,0 +1,77 @@
+# interpolation.py
+#
+# Inverse-distance-weighted (IDW) temperature surface from sparse observations.
+# Fully vectorized over a lat/lon grid with great-circle (haversine) distances;
+# results are cached per observation set, so re-rendering the same result is free.
+
+import hashlib
+import os
+
+import numpy as np
+
+from cache import TTLCache
+from metrics import timed
+
+EARTH_RADIUS_KM = 6371.0
+SURFACE_POWER = float(os.getenv("SURFACE_POWER", "2"))
+# Cells farther than this from every observation are left empty (open ocean, gaps)
+SURFACE_MAX_DISTANCE_KM = float(os.getenv("SURFACE_MAX_DISTANCE_KM", "800"))
+# Grid cells evaluated per block, bounds the size of the distance matrix
+GRID_BLOCK = 4096
+
+surface_cache = TTLCache(ttl_seconds=None, maxsize=64)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance; arguments in degrees, broadcast like numpy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def idw(grid_lat, grid_lon, lat, lon, values, power=SURFACE_POWER, max_distance_km=SURFACE_MAX_DISTANCE_KM):
+    """Interpolates `values` observed at (lat, lon) onto grid points; NaN beyond max_distance_km."""
+    out = np.full(len(grid_lat), np.nan)
+    for start in range(0, len(grid_lat), GRID_BLOCK):
+        block = slice(start, start + GRID_BLOCK)
+        dist = haversine_km(grid_lat[block, None], grid_lon[block, None], lat[None, :], lon[None, :])
+        weights = 1.0 / np.maximum(dist, 1e-6) ** power
+        estimate = (weights @ values) / weights.sum(axis=1)
+        estimate[dist.min(axis=1) > max_distance_km] = np.nan
+        out[block] = estimate
+    return out
+
+
+def grid_for(lat, lon, resolution_deg, fit=False):
+    """Cell centres covering the globe, or only the observations' extent when fit=True."""
+    if fit:
+        pad = 2 * resolution_deg
+        lat_min, lat_max = max(lat.min() - pad, -90), min(lat.max() + pad, 90)
+        lon_min, lon_max = max(lon.min() - pad, -180), min(lon.max() + pad, 180)
+    else:
+        lat_min, lat_max, lon_min, lon_max = -90, 90, -180, 180
+    lats = np.arange(lat_min + resolution_deg / 2, lat_max, resolution_deg)
+    lons = np.arange(lon_min + resolution_deg / 2, lon_max, resolution_deg)
+    grid_lon, grid_lat = np.meshgrid(lons, lats)
+    return grid_lat.ravel(), grid_lon.ravel()
+
+
+@timed("interpolate.surface")
+def temperature_surface(df, resolution_deg=3.0, fit=False, column="temp_c"):
+    """Returns (lat, lon, value) arrays of the non-empty grid cells for a result frame."""
+    points = df[["lat", "lon", column]].dropna().to_numpy(dtype=np.float64)
+    key = (hashlib.sha1(points.tobytes()).hexdigest(), resolution_deg, fit, column)
+    cached = surface_cache.get(key)
+    if cached is not None:
+        return cached
+
+    lat, lon, values = points[:, 0], points[:, 1], points[:, 2]
+    if len(points) == 0:
+        surface = (lat, lon, values)
+    else:
+        grid_lat, grid_lon = grid_for(lat, lon, resolution_deg, fit=fit)
+        estimate = idw(grid_lat, grid_lon, lat, lon, values)
+        keep = ~np.isnan(estimate)
+        surface = (grid_lat[keep], grid_lon[keep], np.round(estimate[keep], 1))
+    surface_cache.set(key, surface)
+    return surface
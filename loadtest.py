@@ -0,0 +1,371 @@
+# loadtest.py
+#
+# Concurrent-user load test for the dashboard's Dash callbacks.
+#
+#   python loadtest.py --users 20 --duration 120
+#   python loadtest.py --users 50 --think 2 --api-latency-ms 300 --json report.json
+#   python loadtest.py --url http://127.0.0.1:8050 --server-pid 12345   # existing server
+#
+# By default it starts fake_weather_api.py and the dashboard (pointed at it) as
+# subprocesses. Each simulated user loads the layout, switches tabs, downloads the
+# dropdown hierarchy once (the cascade itself runs in the browser) or types into the
+# place search, and runs the submit-and-poll cycle of a handle_*_tab callback through
+# POST /_dash-update-component, with random think times in between.
+# Reports throughput, latency percentiles and error rates per action, plus the
+# server's RSS and CPU over time (Linux /proc, when the server pid is known).
+
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from threading import Event, Lock, Thread
+
+import requests
+
+CITIES_CSV = "data/cities.csv"
+TAB_WEIGHTS = {"world": 2, "continent": 3, "country": 3, "region": 3, "city": 4}
+
+
+class Recorder:
+    """Thread-safe latency/error log per action."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = Lock()
+
+    def record(self, action, seconds, ok=True):
+        with self.lock:
+            self.samples[action].append(seconds)
+            if not ok:
+                self.errors[action] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        with self.lock:
+            for action, values in sorted(self.samples.items()):
+                ordered = sorted(values)
+                pct = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+                rows[action] = {
+                    "count": len(values),
+                    "per_s": round(len(values) / elapsed, 2),
+                    "errors": self.errors[action],
+                    "error_rate": round(self.errors[action] / len(values), 4),
+                    "p50_ms": round(pct(50), 1),
+                    "p95_ms": round(pct(95), 1),
+                    "p99_ms": round(pct(99), 1),
+                }
+        return rows
+
+
+class ResourceSampler(Thread):
+    """Samples a process's RSS (MB) and CPU (%) once per second from /proc."""
+
+    def __init__(self, pid, stop):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.stop = stop
+        self.series = []
+
+    def read(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        with open(f"/proc/{self.pid}/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        return cpu_ticks, rss_kb
+
+    def run(self):
+        ticks_per_s = os.sysconf("SC_CLK_TCK")
+        started = time.monotonic()
+        try:
+            last_ticks, _ = self.read()
+            last = time.monotonic()
+            while not self.stop.wait(1.0):
+                ticks, rss_kb = self.read()
+                now = time.monotonic()
+                cpu = (ticks - last_ticks) / ticks_per_s / (now - last) * 100
+                self.series.append({"t": round(now - started, 1), "rss_mb": round(rss_kb / 1024, 1), "cpu_pct": round(cpu, 1)})
+                last_ticks, last = ticks, now
+        except (OSError, StopIteration, ValueError):
+            pass  # not Linux, or the process went away
+
+
+def load_places():
+    with open(CITIES_CSV, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def find_component(node, component_id):
+    """Depth-first search of a serialized Dash layout for a component id."""
+    if isinstance(node, dict):
+        if node.get("props", {}).get("id") == component_id:
+            return node
+        for value in node.values():
+            found = find_component(value, component_id)
+            if found:
+                return found
+    elif isinstance(node, list):
+        for value in node:
+            found = find_component(value, component_id)
+            if found:
+                return found
+    return None
+
+
+class User(Thread):
+    def __init__(self, index, args, places, recorder, stop):
+        super().__init__(daemon=True, name=f"user-{index}")
+        self.args = args
+        self.places = places
+        self.recorder = recorder
+        self.stop = stop
+        self.rng = random.Random(index)
+        self.http = requests.Session()
+        self.session_id = None
+        self.fetched = set()
+
+    def think(self):
+        self.stop.wait(self.rng.expovariate(1 / self.args.think) if self.args.think > 0 else 0)
+
+    def timed(self, action, fn):
+        start = time.perf_counter()
+        try:
+            response = fn()
+            ok = response.status_code in (200, 204)
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(action, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    def callback(self, action, outputs, inputs, state=(), changed=None):
+        multi = len(outputs) > 1
+        output_specs = [{"id": o.rsplit(".", 1)[0], "property": o.rsplit(".", 1)[1]} for o in outputs]
+        body = {
+            "output": f"..{'...'.join(outputs)}.." if multi else outputs[0],
+            "outputs": output_specs if multi else output_specs[0],
+            "inputs": [{"id": i, "property": p, "value": v} for i, p, v in inputs],
+            "state": [{"id": i, "property": p, "value": v} for i, p, v in state],
+            "changedPropIds": changed or [f"{inputs[0][0]}.{inputs[0][1]}"],
+        }
+        response = self.timed(action, lambda: self.http.post(f"{self.args.url}/_dash-update-component", json=body, timeout=60))
+        if response is None or response.status_code == 204:
+            return {}
+        return response.json().get("response", {})
+
+    def load_page(self):
+        self.timed("page", lambda: self.http.get(f"{self.args.url}/", timeout=30))
+        response = self.timed("layout", lambda: self.http.get(f"{self.args.url}/_dash-layout", timeout=30))
+        store = find_component(response.json(), "session-id") if response is not None else None
+        self.session_id = store["props"].get("data") if store else f"loadtest-{self.name}"
+        self.fetched.clear()
+
+    def run_job(self, tab, inputs_state, button=None, buttons=None):
+        """Submit, then poll at the progress interval until the view arrives."""
+        outputs = [f"progress-bar-{tab}.value", f"weather-output-{tab}.children",
+                   f"progress-wrapper-{tab}.style", f"progress-interval-{tab}.disabled"]
+        state = inputs_state + [("session-id", "data", self.session_id)]
+        button = button or f"submit-{tab}"
+        buttons = buttons or [button]
+        inputs = lambda n: [(b, "n_clicks", 1 if b == button else None) for b in buttons] + [(f"progress-interval-{tab}", "n_intervals", n)]
+        job = f"job.{button.removeprefix('submit-')}"
+
+        started = time.perf_counter()
+        response = self.callback(f"submit.{tab}", outputs, inputs(0), state, [f"{button}.n_clicks"])
+        if f"weather-output-{tab}" in response:  # served from cache (e.g. a prefetched forecast)
+            self.recorder.record(job, time.perf_counter() - started)
+            return
+        deadline = started + self.args.job_timeout
+        n = 0
+        while time.perf_counter() < deadline and not self.stop.is_set():
+            self.stop.wait(0.5)  # dcc.Interval(interval=500)
+            n += 1
+            response = self.callback("poll", outputs, inputs(n), state, [f"progress-interval-{tab}.n_intervals"])
+            if f"weather-output-{tab}" in response:
+                self.recorder.record(job, time.perf_counter() - started)
+                return
+        if not self.stop.is_set():  # jobs cut off by the end of the test are not failures
+            self.recorder.record(job, time.perf_counter() - started, ok=False)
+
+    def fetch_places(self, tab_content, names):
+        """The browser downloads the dropdown hierarchy once per page (see assets/places.js)."""
+        store = find_component(tab_content, "place-urls")
+        for name in names:
+            url = store["props"]["data"][name] if store else None
+            if url and url not in self.fetched:
+                self.fetched.add(url)
+                self.timed(f"places.{name}", lambda: self.http.get(f"{self.args.url}{url}", timeout=30))
+
+    def select_city(self, country, region, city, place):
+        """A picked city starts its forecast prefetch (app.prefetch_city_forecast)."""
+        changed = "place-search-city.value" if place else "dropdown-city.value"
+        self.callback("prefetch", ["city-prefetch.data"],
+                      [("dropdown-city", "value", city), ("place-search-city", "value", place)],
+                      [("country-dropdown-city", "value", country), ("region-dropdown-city", "value", region),
+                       ("city-prefetch", "data", None), ("session-id", "data", self.session_id)], [changed])
+
+    def scenario(self):
+        tab = self.rng.choices(list(TAB_WEIGHTS), weights=list(TAB_WEIGHTS.values()))[0]
+        place = self.rng.choice(self.places)
+        content = self.callback("render_tab", ["tab-content.children"], [("tabs", "active_tab", tab)])
+        self.think()
+        deadline = [(f"deadline-{tab}", "value", self.args.deadline), (f"sampling-{tab}", "value", self.args.sampling)]
+
+        # The dropdown cascades run in the browser, so picking is only think time
+        if tab == "world":
+            self.run_job(tab, [("cap-size-world", "value", self.args.cap_size)] + deadline,
+                         buttons=["submit-world", "show-sweep-world"])
+        elif tab == "continent":
+            self.run_job(tab, [("dropdown-continent", "value", place["continent"]),
+                               ("cap-size-continent", "value", self.args.cap_size)] + deadline)
+        elif tab == "country":
+            self.fetch_places(content, ["hierarchy"])
+            self.think()
+            self.run_job(tab, [("dropdown-country", "value", place["country"]),
+                               ("cap-size-country", "value", self.args.cap_size)] + deadline)
+        elif tab == "region":
+            self.fetch_places(content, ["hierarchy"])
+            self.think()
+            forecast = self.rng.random() < self.args.forecast_share
+            self.run_job(tab, [("country-dropdown-region", "value", place["country"]),
+                               ("dropdown-region", "value", place["region"]),
+                               ("cap-size-region", "value", min(self.args.cap_size, 100))] + deadline,
+                         button="submit-forecast-region" if forecast else None,
+                         buttons=["submit-region", "submit-forecast-region"])
+        elif self.rng.random() < 0.5:
+            self.fetch_places(content, ["hierarchy", "cities"])
+            self.think()
+            self.select_city(place["country"], place["region"], place["city"], None)
+            self.think()
+            self.run_job(tab, [("country-dropdown-city", "value", place["country"]),
+                               ("region-dropdown-city", "value", place["region"]),
+                               ("dropdown-city", "value", place["city"]),
+                               ("place-search-city", "value", None)])
+        else:
+            # Typing into the place search, one request per keystroke
+            for n in range(1, min(len(place["city"]), 5) + 1):
+                self.callback("search", ["place-search-city.options"], [("place-search-city", "search_value", place["city"][:n])])
+                self.stop.wait(0.15)
+            value = "|".join((place["country"], place["region"], place["city"]))
+            self.select_city(None, None, None, value)
+            self.think()
+            self.run_job(tab, [("country-dropdown-city", "value", None),
+                               ("region-dropdown-city", "value", None),
+                               ("dropdown-city", "value", None),
+                               ("place-search-city", "value", value)])
+        self.think()
+
+    def run(self):
+        self.stop.wait(self.rng.uniform(0, self.args.ramp_up))
+        self.load_page()
+        while not self.stop.is_set():
+            self.scenario()
+
+
+def wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return True
+        except requests.RequestException:
+            time.sleep(0.5)
+    return False
+
+
+def start_servers(args):
+    """Starts the API stand-in and the dashboard; returns (processes, dashboard pid)."""
+    api = subprocess.Popen([sys.executable, "fake_weather_api.py", "--port", str(args.api_port),
+                            "--latency-ms", str(args.api_latency_ms), "--error-rate", str(args.api_error_rate)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ,
+               API_KEY="loadtest",
+               BASE_URL_CURRENT=f"http://127.0.0.1:{args.api_port}/v1/current.json",
+               BASE_URL_FORECAST=f"http://127.0.0.1:{args.api_port}/v1/forecast.json",
+               # No browser renders the maps, so the base map files are not needed
+               TOPOJSON_CDN_FALLBACK=os.environ.get("TOPOJSON_CDN_FALLBACK", "1"))
+    port = args.url.rsplit(":", 1)[1]
+    dashboard = subprocess.Popen([sys.executable, "-c",
+                                  f"import app; app.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"],
+                                 env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not (wait_until_up(f"http://127.0.0.1:{args.api_port}/") and wait_until_up(args.url)):
+        for proc in (api, dashboard):
+            proc.terminate()
+        sys.exit("servers did not start")
+    return [api, dashboard], dashboard.pid
+
+
+def print_report(summary, series, elapsed, users):
+    total = sum(row["count"] for row in summary.values())
+    errors = sum(row["errors"] for row in summary.values())
+    print(f"\n{users} users, {elapsed:.0f}s: {total} requests/jobs, {total / elapsed:.1f}/s, {errors} errors\n")
+    print(f"{'action':<30} {'count':>7} {'per s':>7} {'err %':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for action, row in summary.items():
+        print(f"{action:<30} {row['count']:>7} {row['per_s']:>7} {row['error_rate'] * 100:>6.1f} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+    if series:
+        print(f"\n{'t (s)':>7} {'RSS MB':>8} {'CPU %':>7}")
+        step = max(len(series) // 20, 1)
+        for point in series[::step]:
+            print(f"{point['t']:>7} {point['rss_mb']:>8} {point['cpu_pct']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the dashboard callbacks with N concurrent users.")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=10, help="users start spread over this many seconds")
+    parser.add_argument("--think", type=float, default=3, help="mean think time between actions (s)")
+    parser.add_argument("--cap-size", type=int, default=100)
+    parser.add_argument("--deadline", type=float, default=0, help="time budget sent with submits (s)")
+    parser.add_argument("--sampling", choices=["regions", "coverage"], default="regions", help="sampling strategy sent with submits")
+    parser.add_argument("--forecast-share", type=float, default=0.3, help="share of Region submits that compare forecasts")
+    parser.add_argument("--job-timeout", type=float, default=120)
+    parser.add_argument("--url", default="http://127.0.0.1:8050", help="dashboard to test")
+    parser.add_argument("--server-pid", type=int, help="pid to sample when testing an existing server")
+    parser.add_argument("--no-spawn", action="store_true", help="don't start servers, test --url as is")
+    parser.add_argument("--api-port", type=int, default=8051)
+    parser.add_argument("--api-latency-ms", type=float, default=150)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    processes, pid = ([], args.server_pid) if args.no_spawn or args.server_pid else start_servers(args)
+    stop = Event()
+    recorder = Recorder()
+    sampler = ResourceSampler(pid, stop) if pid else None
+    if sampler:
+        sampler.start()
+
+    places = load_places()
+    users = [User(i, args, places, recorder, stop) for i in range(args.users)]
+    started = time.monotonic()
+    try:
+        for user in users:
+            user.start()
+        stop.wait(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        elapsed = time.monotonic() - started
+        for user in users:
+            user.join(timeout=5)
+        for proc in processes:
+            proc.terminate()
+
+    summary = recorder.summary(elapsed)
+    series = sampler.series if sampler else []
+    print_report(summary, series, elapsed, args.users)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"users": args.users, "elapsed_s": elapsed, "actions": summary, "server": series}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# metrics.py
+#
+# In-process instrumentation: latency histograms per stage, counters (API calls,
+# bytes, errors) per scope, and gauges computed on demand (in-flight jobs, cache
+# hit ratios). Exposed as JSON on the Flask server behind Dash at /metrics.
+
+import time
+from collections import defaultdict, deque
+from functools import wraps
+from threading import Lock
+
+# Percentiles are computed over the most recent samples of each stage, so memory
+# stays bounded however long the server runs.
+HISTOGRAM_WINDOW = 2048
+
+_lock = Lock()
+_histograms = {}
+_counters = defaultdict(float)
+_gauges = {}
+
+
+class Histogram:
+    def __init__(self, window=HISTOGRAM_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+
+        def pct(p):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            "p50_ms": pct(50),
+            "p95_ms": pct(95),
+            "p99_ms": pct(99),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+def observe(stage, seconds):
+    """Records one latency sample (in seconds) for a stage."""
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = Histogram()
+        hist.observe(seconds)
+
+
+def increment(name, value=1, scope=None):
+    """Adds to a counter, optionally broken down by scope (world, continent, ...)."""
+    key = f"{name}.{scope}" if scope else name
+    with _lock:
+        _counters[key] += value
+
+
+def register_gauge(name, fn):
+    """Registers a callable evaluated each time metrics are read."""
+    _gauges[name] = fn
+
+
+class timed:
+    """Times a block or function into the histogram for `stage`.
+
+    Usable as `with timed("api.current"): ...` or as a decorator `@timed("render.world")`.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def snapshot():
+    """Returns all metrics as a JSON-serialisable dict."""
+    with _lock:
+        histograms = {stage: hist.snapshot() for stage, hist in sorted(_histograms.items())}
+        counters = dict(sorted(_counters.items()))
+    gauges = {}
+    for name, fn in sorted(_gauges.items()):
+        try:
+            gauges[name] = fn()
+        except Exception as e:
+            gauges[name] = f"error: {e}"
+    return {"latency": histograms, "counters": counters, "gauges": gauges}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def register_metrics_endpoint(server, path="/metrics"):
+    """Adds a GET endpoint returning `snapshot()` to a Flask server."""
+    from flask import jsonify
+
+    @server.route(path)
+    def metrics_endpoint():
+        return jsonify(snapshot())
+
+    return metrics_endpoint
@@ -0,0 +1,76 @@
+# place_hierarchy.py
+#
+# The continent -> country -> region -> city hierarchy as static JSON for the
+# client-side dropdown cascade in assets/places.js. Built once from cities.csv and
+# served under content-hash URLs, so a browser downloads each file once and then
+# answers every dropdown change locally.
+#
+#   /places/hierarchy.json  {"continents": {continent: [country]}, "regions": {country: [region]}}
+#   /places/cities.json     {country: {region: [city]}}  (City tab only, fetched when first needed;
+#                           a name found twice in a region is listed per place as "name@lat,lon")
+#
+# Lists are sorted like the data_loader option helpers; labels are title-cased in the browser.
+
+import hashlib
+import json
+from functools import lru_cache
+
+from flask import Response, abort, request
+
+from http_cache import ASSET_MAX_AGE
+from metrics import timed
+
+PLACE_FILES = ("hierarchy", "cities")
+
+
+def _places():
+    from data import get_cities_df
+    return get_cities_df().dropna(subset=["continent", "country", "region", "city"])
+
+
+def build_hierarchy(df):
+    return {
+        "continents": {c: sorted(g.unique()) for c, g in df.groupby("continent")["country"]},
+        "regions": {c: sorted(g.unique()) for c, g in df.groupby("country")["region"]},
+    }
+
+
+def build_cities(df):
+    from utils import city_value
+    cities = {}
+    for (country, region), g in df.groupby(["country", "region"]):
+        # Places sharing a name stay separate entries, told apart by their coordinates
+        duplicate = g["city"].duplicated(keep=False)
+        values = [city_value(city, lat, lon) if dup else city
+                  for city, lat, lon, dup in zip(g["city"], g["lat"], g["lon"], duplicate)]
+        cities.setdefault(country, {})[region] = sorted(set(values))
+    return cities
+
+
+@lru_cache(maxsize=None)
+@timed("places.build")
+def place_json(name):
+    """(body, digest) of a place file."""
+    builder = build_hierarchy if name == "hierarchy" else build_cities
+    body = json.dumps(builder(_places()), separators=(",", ":")).encode()
+    return body, hashlib.sha1(body).hexdigest()[:12]
+
+
+def place_urls(path="/places"):
+    """{name: fingerprinted url}, the data of each tab's `place-urls` store."""
+    return {name: f"{path}/{name}.json?v={place_json(name)[1]}" for name in PLACE_FILES}
+
+
+def register_places_endpoint(server, path="/places"):
+    @server.route(f"{path}/<name>.json")
+    def places(name):
+        if name not in PLACE_FILES:
+            abort(404)
+        body, digest = place_json(name)
+        response = Response(body, mimetype="application/json")
+        if request.args.get("v") == digest:
+            # A new version gets a new URL, so this one never changes
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        return response
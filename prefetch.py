@@ -0,0 +1,124 @@
+# prefetch.py
+#
+# Speculative forecast prefetch for the City tab. Picking a city (cascade or place
+# search) starts its forecast fetch right away, so the Submit click that usually
+# follows is served from data_loader.forecast_cache (or joins the request still in
+# flight). When the region has at most PREFETCH_REGION_MAX cities, the others are
+# warmed too, in case the user switches between them.
+#
+# Speculation is bounded per session: at most PREFETCH_BUDGET forecast requests per
+# PREFETCH_WINDOW_SECONDS, and a new selection cancels whatever the previous one
+# still had queued. Requests run as scope "city_prefetch", below the City tab's
+# own requests in the scheduler (scheduler.py).
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import RLock
+
+from metrics import increment
+from scheduler import session_context
+
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "20"))
+PREFETCH_WINDOW_SECONDS = float(os.getenv("PREFETCH_WINDOW_SECONDS", "600"))
+PREFETCH_REGION_MAX = int(os.getenv("PREFETCH_REGION_MAX", "8"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+PREFETCH_SCOPE = "city_prefetch"
+
+
+class ForecastPrefetcher:
+    def __init__(self, workers=PREFETCH_WORKERS, budget=PREFETCH_BUDGET, window=PREFETCH_WINDOW_SECONDS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.budget = budget
+        self.window = window
+        # session -> (selection generation, queued futures), dropped once they are all done,
+        # and session -> request timestamps within the window, dropped once they expire
+        self.selections = {}
+        self.spent = {}
+        # Reentrant: cancelling a future under the lock runs its done callback (_finished) right away
+        self.lock = RLock()
+
+    def select(self, session, points):
+        """Prefetches `points` ((lat, lon) pairs, most likely first) for a new selection of `session`.
+
+        Cancels what the session's previous selection still had queued; [] only cancels.
+        """
+        with self.lock:
+            generation, futures = self.selections.get(session, (0, []))
+            cancelled = sum(future.cancel() for future in futures)
+            generation += 1
+            futures = [
+                self.pool.submit(self._fetch, session, generation, lat, lon)
+                for lat, lon in points
+            ]
+            self.selections[session] = (generation, futures)
+            if not futures:
+                del self.selections[session]
+            for future in futures:
+                future.add_done_callback(partial(self._finished, session, generation))
+            self._expire_spent(time.monotonic())
+        if cancelled:
+            increment("prefetch.cancelled", cancelled)
+        return generation
+
+    def _finished(self, session, generation, _future):
+        with self.lock:
+            current = self.selections.get(session)
+            if current and current[0] == generation and all(f.done() for f in current[1]):
+                del self.selections[session]
+
+    def _expire_spent(self, now):
+        for session in [s for s, spent in self.spent.items() if not spent or spent[-1] < now - self.window]:
+            del self.spent[session]
+
+    def _take_budget(self, session):
+        now = time.monotonic()
+        with self.lock:
+            spent = self.spent.setdefault(session, deque())
+            while spent and spent[0] < now - self.window:
+                spent.popleft()
+            if len(spent) >= self.budget:
+                return False
+            spent.append(now)
+            return True
+
+    def _fetch(self, session, generation, lat, lon):
+        from cache import coordinate_key
+        from data_loader import fetch_forecast, forecast_cache
+        with self.lock:
+            if self.selections.get(session, (None,))[0] != generation:
+                increment("prefetch.cancelled")
+                return  # the selection changed while this was queued
+        if forecast_cache.get(coordinate_key(lat, lon)) is not None:
+            return
+        if not self._take_budget(session):
+            increment("prefetch.over_budget")
+            return
+        increment("prefetch.requests")
+        with session_context(session):
+            fetch_forecast(lat, lon, scope=PREFETCH_SCOPE)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self.selections),
+                "queued": sum(not f.done() for _, futures in self.selections.values() for f in futures),
+            }
+
+
+def selection_points(cities, country, region, city):
+    """(lat, lon) of the selected city, then of the rest of its region when the region is small."""
+    from utils import get_city_row, scope_cities
+    row = get_city_row(cities, country, region, city)
+    if row.empty:
+        return []
+    points = [(row["lat"].iat[0], row["lon"].iat[0])]
+    neighbours = scope_cities(cities, "region", country, region)
+    if len(neighbours) <= PREFETCH_REGION_MAX:
+        points += [(lat, lon) for lat, lon in zip(neighbours["lat"], neighbours["lon"]) if (lat, lon) != points[0]]
+    return points
+
+
+forecast_prefetcher = ForecastPrefetcher()
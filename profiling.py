@@ -0,0 +1,185 @@
+# profiling.py
+#
+# Opt-in profiling for callbacks and background fetch jobs.
+#
+# Enable for every request with PROFILE=1, or per request with an `X-Profile: 1`
+# header (or a `profile=1` cookie, for browsers). Output goes to PROFILE_DIR:
+#
+#   PROFILE_MODE=sampling       *.folded  collapsed stacks (flamegraph.pl, speedscope)
+#   PROFILE_MODE=deterministic  *.prof    cProfile stats (snakeviz, flameprof, pstats)
+#   PROFILE_TRACEMALLOC=1       *.mem.txt top allocation sites (tracemalloc snapshot)
+#
+# When profiling is off, a wrapped call costs one flag check.
+
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+
+from flask import has_request_context, request
+
+PROFILE_ENABLED = os.getenv("PROFILE", "0") == "1"
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))  # seconds between samples
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))  # most recent profiles kept on disk
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def profiling_requested():
+    """True if profiling is on globally or requested by the current HTTP request."""
+    if PROFILE_ENABLED:
+        return True
+    if not has_request_context():
+        return False
+    return request.headers.get("X-Profile") == "1" or request.cookies.get("profile") == "1"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds into folded stacks."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc(path):
+    global _tracemalloc_users
+    snapshot = tracemalloc.take_snapshot()
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    with open(path, "w") as f:
+        for stat in snapshot.statistics("lineno")[:50]:
+            f.write(f"{stat}\n")
+
+
+def _prune():
+    profiles = list_profiles()
+    for entry in profiles[PROFILE_KEEP * 2:]:  # a profile may come with a .mem.txt
+        try:
+            os.remove(os.path.join(PROFILE_DIR, entry["name"]))
+        except OSError:
+            pass
+
+
+def run_profiled(name, fn, *args, **kwargs):
+    """Runs fn under the configured profiler and writes the result to PROFILE_DIR."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{name}")
+
+    if PROFILE_TRACEMALLOC:
+        _start_tracemalloc()
+    if PROFILE_MODE == "deterministic":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if PROFILE_MODE == "deterministic":
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+        else:
+            profiler.stop()
+            profiler.write(f"{base}.folded")
+        if PROFILE_TRACEMALLOC:
+            _stop_tracemalloc(f"{base}.mem.txt")
+        _prune()
+
+
+def profiled(name):
+    """Decorator: profile the call when profiling_requested(), otherwise call straight through."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profiling_requested():
+                return fn(*args, **kwargs)
+            return run_profiled(name, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profile_target(fn, name):
+    """For Thread targets: decides now (inside the request) whether the thread is profiled."""
+    if not profiling_requested():
+        return fn
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        return run_profiled(name, fn, *args, **kwargs)
+    return wrapper
+
+
+def list_profiles():
+    """Profiles in PROFILE_DIR, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    entries = []
+    for name in os.listdir(PROFILE_DIR):
+        path = os.path.join(PROFILE_DIR, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append({"name": name, "bytes": stat.st_size, "modified": stat.st_mtime})
+    return sorted(entries, key=lambda e: e["modified"], reverse=True)
+
+
+def register_profiles_endpoint(server, path="/profiles"):
+    """GET /profiles lists recent profiles; GET /profiles/<name> downloads one."""
+    from flask import jsonify, send_from_directory
+
+    @server.route(path)
+    def profiles_index():
+        return jsonify({"enabled": PROFILE_ENABLED, "mode": PROFILE_MODE, "profiles": list_profiles()[:PROFILE_KEEP]})
+
+    @server.route(f"{path}/<path:name>")
+    def profiles_download(name):
+        return send_from_directory(os.path.abspath(PROFILE_DIR), name, as_attachment=True)
+
+    return profiles_index
@@ -0,0 +1,96 @@
+# pyramid.py
+#
+# Level-of-detail grid pyramid over observations, for maps with more points than a
+# browser can draw as individual markers (a full sweep has ~33k). Each level bins
+# the points into square cells of LEVEL_SIZES_DEG degrees and keeps per cell the
+# point count, mean/min/max temperature and the mean position of its points.
+# A viewport query returns only the visible cells, at the finest level that keeps
+# them under LOD_MAX_CELLS, so payload and render time stay bounded.
+
+import hashlib
+import os
+
+import numpy as np
+
+from cache import TTLCache
+from metrics import timed
+
+# Coarse to fine
+LEVEL_SIZES_DEG = (16.0, 8.0, 4.0, 2.0, 1.0, 0.5, 0.25, 0.125)
+# Results with more points than this are drawn from the pyramid instead of point by point
+LOD_MIN_POINTS = int(os.getenv("LOD_MIN_POINTS", "2000"))
+LOD_MAX_CELLS = int(os.getenv("LOD_MAX_CELLS", "1500"))
+# Wanted cells across the visible width; picks the level for a zoom
+LOD_CELLS_ACROSS = 60
+
+pyramid_cache = TTLCache(ttl_seconds=None, maxsize=16)
+
+
+def aggregate(lat, lon, values, size):
+    """Per-cell count, mean/min/max of `values` and mean lat/lon for one cell size."""
+    rows = np.floor((lat + 90) / size).astype(np.int64)
+    cols = np.floor((lon + 180) / size).astype(np.int64)
+    cells, inverse = np.unique(rows * 100_000 + cols, return_inverse=True)
+    count = np.bincount(inverse)
+    mean = np.bincount(inverse, weights=values) / count
+    low = np.full(len(cells), np.inf)
+    high = np.full(len(cells), -np.inf)
+    np.minimum.at(low, inverse, values)
+    np.maximum.at(high, inverse, values)
+    return {
+        "lat": np.bincount(inverse, weights=lat) / count,
+        "lon": np.bincount(inverse, weights=lon) / count,
+        "count": count,
+        "mean": np.round(mean, 1),
+        "min": low,
+        "max": high,
+    }
+
+
+class Pyramid:
+    def __init__(self, lat, lon, values):
+        self.levels = [aggregate(lat, lon, values, size) for size in LEVEL_SIZES_DEG]
+        self.points = len(values)
+
+    def level_for(self, lon_span):
+        """Index of the coarsest level at least as fine as LOD_CELLS_ACROSS cells per `lon_span`."""
+        wanted = lon_span / LOD_CELLS_ACROSS
+        for i, size in enumerate(LEVEL_SIZES_DEG):
+            if size <= wanted:
+                return i
+        return len(LEVEL_SIZES_DEG) - 1
+
+    def query(self, bounds=None):
+        """(level, cells) for the visible cells within bounds = (lat_min, lat_max, lon_min, lon_max).
+
+        lon_min > lon_max means the view crosses the antimeridian; None is the whole globe.
+        """
+        lat_min, lat_max, lon_min, lon_max = bounds or (-90, 90, -180, 180)
+        lon_span = (lon_max - lon_min) % 360 or 360
+        level = self.level_for(lon_span)
+        while True:
+            cells = self.levels[level]
+            visible = (cells["lat"] >= lat_min) & (cells["lat"] <= lat_max)
+            if lon_min <= lon_max:
+                visible &= (cells["lon"] >= lon_min) & (cells["lon"] <= lon_max)
+            else:
+                visible &= (cells["lon"] >= lon_min) | (cells["lon"] <= lon_max)
+            if visible.sum() <= LOD_MAX_CELLS or level == 0:
+                return level, {name: column[visible] for name, column in cells.items()}
+            level -= 1
+
+
+def lod_enabled(df):
+    return df is not None and len(df) > LOD_MIN_POINTS
+
+
+@timed("pyramid.build")
+def get_pyramid(df, column="temp_c"):
+    """(key, Pyramid) for a result frame; built once per observation set."""
+    points = df[["lat", "lon", column]].dropna().to_numpy(dtype=np.float64)
+    key = hashlib.sha1(points.tobytes()).hexdigest()
+    pyramid = pyramid_cache.get(key)
+    if pyramid is None:
+        pyramid = Pyramid(points[:, 0], points[:, 1], points[:, 2])
+        pyramid_cache.set(key, pyramid)
+    return key, pyramid
@@ -0,0 +1,151 @@
+# result_store.py
+#
+# Memory-bounded retention of fetched results.
+#
+# pandas is imported inside the functions so importing this module stays cheap.
+# Results are stored compactly (categorical strings, float32 metrics, no imperial
+# duplicates) and kept per (session, tab) in an LRU that evicts the least recently
+# used results, across all sessions, once RESULT_MEMORY_BUDGET_MB is exceeded.
+
+import os
+from collections import OrderedDict
+from threading import Lock
+
+RESULT_MEMORY_BUDGET_MB = float(os.getenv("RESULT_MEMORY_BUDGET_MB", "256"))
+
+# imperial column -> (metric column, conversion); derived on demand in expand_observations
+IMPERIAL_UNITS = {
+    "temp_f": ("temp_c", lambda c: c * 9 / 5 + 32),
+    "feelslike_f": ("feelslike_c", lambda c: c * 9 / 5 + 32),
+    "windchill_f": ("windchill_c", lambda c: c * 9 / 5 + 32),
+    "heatindex_f": ("heatindex_c", lambda c: c * 9 / 5 + 32),
+    "dewpoint_f": ("dewpoint_c", lambda c: c * 9 / 5 + 32),
+    "wind_mph": ("wind_kph", lambda kph: kph * 0.621371),
+    "gust_mph": ("gust_kph", lambda kph: kph * 0.621371),
+    "vis_miles": ("vis_km", lambda km: km * 0.621371),
+    "pressure_in": ("pressure_mb", lambda mb: mb * 0.02953),
+    "precip_in": ("precip_mm", lambda mm: mm * 0.0393701),
+}
+
+# Coordinates keep float64 so they still match cities.csv exactly
+FLOAT64_COLUMNS = {"lat", "lon"}
+
+
+def compact_observations(df):
+    """Returns a compact copy of an observation/forecast frame."""
+    import numpy as np
+    import pandas as pd
+
+    if df is None or df.empty:
+        return df
+
+    columns = list(df.columns)
+    dtypes = df.dtypes.to_dict()
+    df = df.drop(columns=[c for c, (metric, _) in IMPERIAL_UNITS.items() if c in df.columns and metric in df.columns])
+
+    for col in df.columns:
+        series = df[col]
+        if col in FLOAT64_COLUMNS:
+            continue
+        if pd.api.types.is_float_dtype(series):
+            df[col] = series.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif series.dtype == object and series.nunique(dropna=False) <= len(series) // 2:
+            # repeated strings (country, condition_text, condition_icon URLs, ...)
+            df[col] = series.astype("category")
+
+    df.attrs["columns"] = columns
+    df.attrs["dtypes"] = dtypes
+    return df
+
+
+def expand_observations(df):
+    """Inverse of compact_observations: original columns and dtypes, imperial units restored."""
+    import numpy as np
+    import pandas as pd
+
+    if df is None or df.empty or "columns" not in df.attrs:
+        return df
+
+    columns, dtypes = df.attrs["columns"], df.attrs["dtypes"]
+    df = df.copy()
+    # Only the caller's own attrs (partial, coverage, ...) go back out
+    df.attrs = {k: v for k, v in df.attrs.items() if k not in ("columns", "dtypes")}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+        elif df[col].dtype == np.float32:
+            # float32 -> float64 via the decimal repr, so 21.3 stays 21.3 and not 21.299999
+            df[col] = df[col].astype(str).astype(np.float64)
+    for col, (metric, convert) in IMPERIAL_UNITS.items():
+        if col in columns and metric in df.columns:
+            df[col] = convert(df[metric]).round(2)
+    df = df[columns]
+    return df.astype({col: dtype for col, dtype in dtypes.items() if df[col].dtype != dtype})
+
+
+def frame_bytes(df) -> int:
+    if df is None:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ResultStore:
+    """LRU of compact results keyed by (session_id, key), bounded by total memory."""
+
+    def __init__(self, budget_mb=RESULT_MEMORY_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # (session_id, key) -> (frame, bytes)
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, session_id, key, df):
+        compact = compact_observations(df)
+        size = frame_bytes(compact)
+        with self._lock:
+            old = self._entries.pop((session_id, key), None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[(session_id, key)] = (compact, size)
+            self._bytes += size
+            # evict least recently used, but always keep the result just stored
+            while self._bytes > self.budget_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get(self, session_id, key):
+        """Returns the expanded frame, or None if absent/evicted."""
+        with self._lock:
+            entry = self._entries.get((session_id, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((session_id, key))
+            self.hits += 1
+        return expand_observations(entry[0])
+
+    def discard(self, session_id, key):
+        with self._lock:
+            entry = self._entries.pop((session_id, key), None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def has(self, session_id, key):
+        with self._lock:
+            return (session_id, key) in self._entries
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,23 @@
+# sampling.py
+#
+# The sample plan strategies (see utils.get_sample_plan), kept free of pandas so the
+# tab layouts can build the sampling control without loading it:
+#   "regions": round-robin over countries/regions (utils.SAMPLERS)
+#   "coverage": farthest-point sampling over every city of the scope, for even map coverage
+
+import os
+
+# strategy -> label of its option in the sampling control
+SAMPLING_STRATEGIES = {
+    "regions": "By region",
+    "coverage": "Even coverage",
+}
+
+
+def check_strategy(strategy):
+    if strategy not in SAMPLING_STRATEGIES:
+        raise ValueError(f"Unknown sampling strategy {strategy!r}, expected one of {', '.join(SAMPLING_STRATEGIES)}")
+    return strategy
+
+
+SAMPLING_STRATEGY = check_strategy(os.getenv("SAMPLING_STRATEGY", "regions"))
@@ -0,0 +1,136 @@
+# scheduler.py
+#
+# One gate in front of every outbound WeatherAPI request, shared by all jobs:
+#   * at most API_CONCURRENCY requests in flight across the whole server
+#   * a free slot goes to the highest priority class with someone waiting:
+#     interactive (City tab) > small (Region tab, City tab prefetch) > bulk (World/Continent/Country, refresh)
+#   * within a class, sessions take turns (round robin), FIFO within a session
+# so a single-city forecast never queues behind a 400-point World job.
+#
+# The session of the request being made is taken from `current_session`, set by
+# the job thread (see app.run_weather_fetch); thread pools inside a job carry it
+# over with contextvars.copy_context().
+
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Event, Lock
+
+from metrics import increment, observe
+
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "8"))
+# Longest a request waits for a slot before it gives up (and counts as a failed API call)
+SCHEDULER_WAIT_SECONDS = float(os.getenv("SCHEDULER_WAIT_SECONDS", "60"))
+
+INTERACTIVE, SMALL, BULK = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SMALL: "small", BULK: "bulk"}
+# fetch scope -> priority class; anything else (world, continent, country, export, background, ...) is bulk
+SCOPE_PRIORITIES = {
+    "city": INTERACTIVE,
+    "region": SMALL,
+    "region_forecast": SMALL,
+    "city_prefetch": SMALL,
+}
+
+current_session = ContextVar("current_session", default=None)
+
+
+def priority_for(scope):
+    return SCOPE_PRIORITIES.get(scope, BULK)
+
+
+class RequestScheduler:
+    def __init__(self, max_concurrency=API_CONCURRENCY, wait_seconds=SCHEDULER_WAIT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.wait_seconds = wait_seconds
+        self.active = 0
+        # one OrderedDict per class: session -> deque of waiting events, in turn order
+        self.queues = [OrderedDict() for _ in PRIORITY_NAMES]
+        self.lock = Lock()
+
+    @contextmanager
+    def slot(self, scope=None, session=None):
+        """Holds one of the global request slots for the duration of the block."""
+        priority = priority_for(scope)
+        name = PRIORITY_NAMES[priority]
+        started = time.perf_counter()
+        self._acquire(priority, session if session is not None else current_session.get())
+        observe(f"scheduler.wait.{name}", time.perf_counter() - started)
+        increment("scheduler.requests", scope=name)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _acquire(self, priority, session):
+        with self.lock:
+            if self.active < self.max_concurrency and not self._waiting():
+                self.active += 1
+                return
+            event = Event()
+            self.queues[priority].setdefault(session, deque()).append(event)
+        # _release hands its slot straight to us, so `active` is already counted
+        if event.wait(self.wait_seconds):
+            return
+        with self.lock:
+            # Handed a slot just as the wait ran out: keep it
+            if event.is_set():
+                return
+            waiters = self.queues[priority][session]
+            waiters.remove(event)
+            if not waiters:
+                del self.queues[priority][session]
+        increment("scheduler.timeouts", scope=PRIORITY_NAMES[priority])
+        raise TimeoutError(f"no API slot free after {self.wait_seconds:g}s")
+
+    def _release(self):
+        with self.lock:
+            event = self._next_waiter()
+            if event is None:
+                self.active -= 1
+            else:
+                event.set()
+
+    def _waiting(self):
+        return any(self.queues)
+
+    def _next_waiter(self):
+        for sessions in self.queues:
+            if not sessions:
+                continue
+            session, waiters = next(iter(sessions.items()))
+            event = waiters.popleft()
+            # This session has had its turn: drop it, or move it behind the others
+            if waiters:
+                sessions.move_to_end(session)
+            else:
+                del sessions[session]
+            return event
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": self.active,
+                "limit": self.max_concurrency,
+                "queued": {
+                    PRIORITY_NAMES[p]: sum(len(w) for w in sessions.values())
+                    for p, sessions in enumerate(self.queues)
+                },
+                "queued_sessions": sum(len(sessions) for sessions in self.queues),
+            }
+
+
+@contextmanager
+def session_context(session):
+    """Attributes the requests made inside the block (and in pools it copies its context to) to `session`."""
+    token = current_session.set(session)
+    try:
+        yield
+    finally:
+        current_session.reset(token)
+
+
+request_scheduler = RequestScheduler()
@@ -0,0 +1,165 @@
+# search_index.py
+#
+# Typeahead index over the place names in cities.csv, built once per process.
+# Names are accent- and case-folded ("São Paulo" -> "sao paulo"). A query is matched
+#   1. as a prefix of a city name or of any word in it (bisect over sorted keys),
+#   2. with extra words narrowing by region/country ("springfield illinois"),
+#   3. by trigram similarity when there are too few prefix hits (typos).
+# A query naming a region or country exactly ("bavaria") also lists that place's cities,
+# largest first (by their order in data/regions.csv).
+# Results are ranked exact name > in the named region/country > name prefix > word prefix > fuzzy,
+# then shorter names first.
+
+import os
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+
+from metrics import timed
+
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))
+# Prefix keys scanned per query at most, bounds one-letter queries
+MAX_PREFIX_SCAN = 5000
+MIN_FUZZY_SIMILARITY = 0.3
+# Distinct queries whose results are kept per index
+SEARCH_CACHE_SIZE = 4096
+VALUE_SEPARATOR = "|"
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode().lower()
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in text).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def place_value(country, region, city):
+    return VALUE_SEPARATOR.join((country, region, city))
+
+
+def parse_place_value(value):
+    """(country, region, city) from a search result value."""
+    return tuple(value.split(VALUE_SEPARATOR, 2))
+
+
+class SearchIndex:
+    def __init__(self, places, major=()):
+        """`places`: iterable of (country, region, city, lat, lon) as they appear in cities.csv.
+
+        A name found more than once in a region is kept per place: its value carries the
+        coordinates ("name@lat,lon", as in place_hierarchy) and so does its label.
+
+        `major`: (country, region, city) of major cities, largest first; they lead the
+        cities listed for a region or country name.
+        """
+        from utils import city_value
+        major = {tuple(normalize(part) for part in place): n for n, place in enumerate(major)}
+        places = list(dict.fromkeys(places))
+        names_in_region = Counter((country, region, city) for country, region, city, _, _ in places)
+        self.names, self.words, self.options = [], [], []
+        postings = {}
+        # normalized region or country name -> (id, size rank) of its cities
+        areas = {}
+        keys = []
+        for country, region, city, lat, lon in places:
+            i = len(self.names)
+            name = normalize(city)
+            self.names.append(name)
+            self.words.append(tuple(set(normalize(f"{city} {region} {country}").split())))
+            duplicate = names_in_region[country, region, city] > 1
+            self.options.append({
+                "label": f"{city.title()}, {region.title()}, {country.title()}" + (f" ({lat}, {lon})" if duplicate else ""),
+                "value": place_value(country, region, city_value(city, lat, lon) if duplicate else city),
+            })
+            # The whole name and every word-suffix of it, so "york" finds "new york"
+            name_words = name.split()
+            for w in range(len(name_words)):
+                keys.append((" ".join(name_words[w:]), i))
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(i)
+            size_rank = major.get((normalize(country), normalize(region), name), len(major))
+            for area in {normalize(region), normalize(country)}:
+                areas.setdefault(area, []).append((i, size_rank))
+        keys.sort()
+        self.keys = [k for k, _ in keys]
+        self.key_ids = [i for _, i in keys]
+        self.postings = postings
+        self.areas = areas
+        # Cached per instance, so a replaced index is freed together with its results
+        self._search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._rank)
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix_matches(self, prefix):
+        """(id, tier) for names starting with `prefix`: 0 exact, 2 name prefix, 3 word prefix (1: see areas)."""
+        start = bisect_left(self.keys, prefix)
+        for j in range(start, min(start + MAX_PREFIX_SCAN, len(self.keys))):
+            key = self.keys[j]
+            if not key.startswith(prefix):
+                break
+            i = self.key_ids[j]
+            name = self.names[i]
+            yield i, 0 if name == prefix else 2 if key == name else 3
+
+    def fuzzy_matches(self, text):
+        """(id, similarity) for names sharing enough trigrams with `text` (Jaccard)."""
+        grams = trigrams(text)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.postings.get(gram, ()))
+        for i, shared in overlap.items():
+            similarity = shared / (len(grams) + len(self.names[i]) + 2 - shared)
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                yield i, similarity
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Top `limit` dropdown options ({"label", "value"}) for a typed query."""
+        return [self.options[i] for i in self._search(normalize(query), limit)]
+
+    def _rank(self, text, limit):
+        if not text:
+            return ()
+        ranks = {}
+
+        def consider(i, rank):
+            rank = rank + (len(self.names[i]), self.options[i]["label"])
+            if i not in ranks or rank < ranks[i]:
+                ranks[i] = rank
+
+        for i, tier in self.prefix_matches(text):
+            consider(i, (tier, 0))
+        # The query names a region or country: its cities come right after exact name matches
+        for i, size_rank in self.areas.get(text, ()):
+            consider(i, (1, size_rank))
+        first, *rest = text.split()
+        if rest:
+            for i, tier in self.prefix_matches(first):
+                if all(any(w.startswith(t) for w in self.words[i]) for t in rest):
+                    consider(i, (tier, 0))
+        # Fuzzy matching is on the name only, so it is skipped once extra words have matched
+        if len(ranks) < limit and len(text) >= 3 and not (rest and ranks):
+            for i, similarity in self.fuzzy_matches(text):
+                consider(i, (4, -similarity))
+        return tuple(sorted(ranks, key=ranks.get)[:limit])
+
+
+@lru_cache(maxsize=1)
+@timed("search.build_index")
+def get_search_index():
+    import pandas as pd
+    from data import get_cities_df
+    from build_representative_points import MAJOR_CITIES_CSV
+    cities = get_cities_df().dropna(subset=["country", "region", "city"])
+    major = pd.read_csv(MAJOR_CITIES_CSV).dropna(subset=["country", "region", "city"])
+    return SearchIndex(zip(cities["country"], cities["region"], cities["city"], cities["lat"], cities["lon"]),
+                       zip(major["country"], major["region"], major["city"]))
+
+
+@timed("search.query")
+def search_places(query, limit=SEARCH_LIMIT):
+    return get_search_index().search(query, limit)
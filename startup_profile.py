@@ -0,0 +1,70 @@
+# startup_profile.py
+#
+# Startup profile report: where does cold-start time go?
+#
+#   python startup_profile.py            # top 20 modules by cumulative import time
+#   python startup_profile.py --top 40
+#
+# Runs `python -X importtime -c "import app"` in a fresh interpreter, then times
+# building each tab layout for the first time (cold) and again (memoized).
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+def profile_imports(target="app"):
+    """Returns [(module, self_us, cumulative_us)] for a cold `import target`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_tab_layouts():
+    """Returns [(tab, cold_ms, warm_ms)] for every tab layout in app.TAB_LAYOUTS."""
+    import app
+    rows = []
+    for tab in app.TAB_LAYOUTS:
+        start = time.perf_counter()
+        app.render_tab(tab)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        app.render_tab(tab)
+        warm = time.perf_counter() - start
+        rows.append((tab, cold * 1000, warm * 1000))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown for the dashboard.")
+    parser.add_argument("--top", type=int, default=20, help="number of modules to list")
+    parser.add_argument("--target", default="app", help="module to import")
+    args = parser.parse_args()
+
+    rows = profile_imports(args.target)
+    if not rows:
+        sys.exit(f"could not import {args.target}")
+    total = max(r[2] for r in rows)
+    print(f"Cold import of '{args.target}': {total / 1000:.1f} ms\n")
+    print(f"{'module':<50} {'self ms':>9} {'cumul. ms':>10}")
+    for module, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{module:<50} {self_us / 1000:>9.1f} {cumulative_us / 1000:>10.1f}")
+
+    if args.target == "app":
+        print(f"\n{'tab layout':<50} {'first ms':>9} {'repeat ms':>10}")
+        for tab, cold, warm in profile_tab_layouts():
+            print(f"{tab:<50} {cold:>9.1f} {warm:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# sweep.py
+#
+# Full sweep: current conditions for every city in cities.csv, sharded across
+# worker processes.
+#
+#   python sweep.py -o exports/all_cities.parquet --workers 8 --concurrency 4 --rate 40
+#   python sweep.py -o exports/all_cities.csv --workers 4 --limit 2000     # a trial run
+#
+# Each worker process owns one shard: its own keep-alive API session, requests
+# in flight (--concurrency), a 1/N share of the request rate (--rate, the API
+# quota in requests/s) and a streaming row writer with its own checkpoint.
+# Everything lives in <output>.sweep/; re-running the same command resumes every
+# unfinished shard and skips finished ones (--fresh starts over). When all shards
+# are complete they are merged, shard by shard, into one CSV or Parquet file.
+#
+# The World tab's "Show last full sweep" reads the merged file from SWEEP_OUTPUT.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from multiprocessing import get_context
+from threading import Lock
+
+from export import Checkpoint, RowWriter, check_parquet, fetch_all, spool_to_parquet
+
+SWEEP_OUTPUT = os.getenv("SWEEP_OUTPUT", "exports/all_cities.parquet")
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads (rate <= 0: unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = time.monotonic()
+        self.lock = Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(self.next_at, now)
+            self.next_at = at + self.interval
+        time.sleep(max(at - now, 0))
+
+
+class Sweep:
+    """<output>.sweep/: manifest.json plus one export Checkpoint per shard."""
+
+    def __init__(self, output):
+        self.output = output
+        self.path = f"{output}.sweep"
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def shard(self, index):
+        return Checkpoint(os.path.join(self.path, f"shard-{index:03d}"))
+
+    def create(self, plan, shards):
+        os.makedirs(self.path, exist_ok=True)
+        # Contiguous ranges, so the merged file follows cities.csv shard by shard
+        bounds = [round(len(plan) * i / shards) for i in range(shards + 1)]
+        for i in range(shards):
+            self.shard(i).create(plan.iloc[bounds[i]:bounds[i + 1]])
+        with open(self.manifest_path, "w") as f:
+            json.dump({"shards": shards, "points": len(plan)}, f)
+
+    def manifest(self):
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def run_shard(task):
+    """Worker process entry point: fetches the unfinished points of one shard."""
+    from data_loader import fetch_current
+
+    index, output, concurrency, rate = task
+    checkpoint = Sweep(output).shard(index)
+    plan = checkpoint.load_plan()
+    todo = plan[~plan.index.isin(checkpoint.done())]
+    limiter = RateLimiter(rate)
+
+    def fetch(lat, lon, scope):
+        limiter.wait()
+        return fetch_current(lat, lon, scope)
+
+    writer = RowWriter(checkpoint.spool_path, checkpoint.done_path)
+    started = time.perf_counter()
+    try:
+        failed = fetch_all(todo, writer, "sweep", concurrency, log_every=250, fetch=fetch, label=f"[shard {index}] ")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "shard": index, "points": len(plan), "todo": len(todo), "fetched": writer.rows, "failed": failed,
+        "seconds": round(elapsed, 1), "per_s": round(writer.rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def merge(sweep, shards, output, fmt):
+    paths = [sweep.shard(i).spool_path for i in range(shards)]
+    if fmt == "parquet":
+        spool_to_parquet(paths, output)
+        return
+    with open(output, "w", newline="") as out:
+        header_written = False
+        for path in paths:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                continue
+            with open(path, newline="") as f:
+                header = f.readline()
+                if not header_written:
+                    out.write(header)
+                    header_written = True
+                shutil.copyfileobj(f, out)
+
+
+def load_sweep(df=None, step_callback=None, scope=None, path=SWEEP_OUTPUT):
+    """The merged output of the last sweep, as a fetch job result (see app.start_weather_fetch)."""
+    import pandas as pd
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No sweep output at {path}; run `python sweep.py -o {path}` first")
+    if path.endswith(".parquet"):
+        result = pd.read_parquet(path)
+        # Text columns as plain objects, like read_csv, so the result store can compact them
+        result = result.astype({c: object for c, dtype in result.dtypes.items() if isinstance(dtype, pd.StringDtype)})
+    else:
+        result = pd.read_csv(path)
+    if step_callback:
+        step_callback(100)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch current conditions for every city, sharded across processes.")
+    parser.add_argument("-o", "--output", default=SWEEP_OUTPUT, help="output file (.csv or .parquet, default: SWEEP_OUTPUT)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="defaults to the output extension")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="worker processes (= shards)")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight per worker")
+    parser.add_argument("--rate", type=float, default=0, help="total requests/s across workers (0 = unlimited)")
+    parser.add_argument("--limit", type=int, help="only the first N cities (trial runs)")
+    parser.add_argument("--fresh", action="store_true", help="discard shard checkpoints and start over")
+    args = parser.parse_args(argv)
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    check_parquet(parser, fmt)
+
+    sweep = Sweep(args.output)
+    if args.fresh:
+        sweep.remove()
+    if sweep.exists():
+        manifest = sweep.manifest()
+        if manifest["shards"] != args.workers:
+            print(f"Resuming with the sweep's {manifest['shards']} shards (ignoring --workers {args.workers})", file=sys.stderr)
+    else:
+        from data import get_cities_df
+        plan = get_cities_df()[["lat", "lon"]]
+        if args.limit:
+            plan = plan.head(args.limit)
+        sweep.create(plan.reset_index(drop=True), args.workers)
+        manifest = sweep.manifest()
+    shards = manifest["shards"]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tasks = [(i, args.output, args.concurrency, args.rate / shards) for i in range(shards)]
+    started = time.perf_counter()
+    # spawn: workers start clean instead of inheriting this process's threads and sockets
+    with get_context("spawn").Pool(shards) as pool:
+        results = pool.map(run_shard, tasks)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n{'shard':>5} {'points':>7} {'fetched':>8} {'failed':>7} {'seconds':>8} {'per s':>7}", file=sys.stderr)
+    for r in results:
+        print(f"{r['shard']:>5} {r['points']:>7} {r['fetched']:>8} {r['failed']:>7} {r['seconds']:>8} {r['per_s']:>7}", file=sys.stderr)
+    fetched = sum(r["fetched"] for r in results)
+    failed = sum(r["failed"] for r in results)
+    print(f"Fetched {fetched} points in {elapsed:.1f}s ({fetched / elapsed:.1f}/s), {failed} failed", file=sys.stderr)
+    if failed:
+        print(f"Re-run the same command to retry failed points (sweep: {sweep.path})", file=sys.stderr)
+        return 1
+
+    merge(sweep, shards, args.output, fmt)
+    sweep.remove()
+    print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,31 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from data import cities_df
-from data_loader import get_countries
+from data import get_cities_df
+from place_hierarchy import place_urls
 from views.progress_view import render_progress_view
 
-countries = get_countries(cities_df)
-
 def city_layout():
+    # Imported here so pandas is only pulled in once this tab is first opened
+    from data_loader import get_countries
+    countries = get_countries(get_cities_df())
+
     return html.Div([
+        # Where assets/places.js loads the dropdown cascade's options from
+        dcc.Store(id="place-urls", data=place_urls()),
+        # Selection whose forecast is being prefetched (app.prefetch_city_forecast)
+        dcc.Store(id="city-prefetch"),
+        # Typeahead over every city; options come from search_index as the user types
+        dbc.Row([
+            dbc.Col([
+                html.Label("Search any place"),
+                dcc.Dropdown(
+                    id="place-search-city",
+                    placeholder="Type a city, e.g. \"springfield illinois\"",
+                    className="mb-3"
+                )
+            ], width=10),
+        ]),
+
         dbc.Row([
 
             dbc.Col([
@@ -1,12 +1,13 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from data import cities_df
-from data_loader import get_continents
-from views.progress_view import render_progress_view
-
-continents = get_continents(cities_df)
+from data import get_cities_df
+from views.progress_view import render_progress_view, render_deadline_control, render_sampling_control
 
 def continent_layout():
+    # Imported here so pandas is only pulled in once this tab is first opened
+    from data_loader import get_continents
+    continents = get_continents(get_cities_df())
+
     return html.Div([
         dbc.Row([
 
@@ -20,8 +21,11 @@ def continent_layout():
                     value=200,
                     marks={i: str(i) for i in range(100, 401, 50)},
                     tooltip={"placement": "bottom", "always_visible": True}
-                )
-            ], width=7),
+                ),
+                render_sampling_control('continent')
+            ], width=5),
+
+            render_deadline_control('continent'),
 
             dbc.Col([
                 html.Label("Continent"),
@@ -1,13 +1,17 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from data import cities_df
-from data_loader import get_continents
-from views.progress_view import render_progress_view
-
-continents = get_continents(cities_df)
+from data import get_cities_df
+from place_hierarchy import place_urls
+from views.progress_view import render_progress_view, render_deadline_control, render_sampling_control
 
 def country_layout():
+    # Imported here so pandas is only pulled in once this tab is first opened
+    from data_loader import get_continents
+    continents = get_continents(get_cities_df())
+
     return html.Div([
+        # Where assets/places.js loads the dropdown cascade's options from
+        dcc.Store(id="place-urls", data=place_urls()),
         dbc.Row([
             dbc.Col([
                 html.Label("Cap Size"),
@@ -19,8 +23,11 @@ def country_layout():
                     value=100,
                     marks={i: str(i) for i in range(50, 401, 50)},
                     tooltip={"placement": "bottom", "always_visible": True}
-                )
-            ], width=6),
+                ),
+                render_sampling_control('country')
+            ], width=4),
+
+            render_deadline_control('country'),
             
             dbc.Col([
                 html.Label("Continent"),
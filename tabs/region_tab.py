@@ -1,13 +1,17 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from data import cities_df
-from data_loader import get_countries
-from views.progress_view import render_progress_view
-
-countries = get_countries(cities_df)
+from data import get_cities_df
+from place_hierarchy import place_urls
+from views.progress_view import render_progress_view, render_deadline_control, render_sampling_control
 
 def region_layout():
+    # Imported here so pandas is only pulled in once this tab is first opened
+    from data_loader import get_countries
+    countries = get_countries(get_cities_df())
+
     return html.Div([
+        # Where assets/places.js loads the dropdown cascade's options from
+        dcc.Store(id="place-urls", data=place_urls()),
         dbc.Row([
             dbc.Col([
                 html.Label("Cap Size"),
@@ -19,8 +23,11 @@ def region_layout():
                     value=20,
                     marks={i: str(i) for i in range(10, 101, 10)},
                     tooltip={"placement": "bottom", "always_visible": True}
-                )
-            ], width=6),
+                ),
+                render_sampling_control('region')
+            ], width=4),
+
+            render_deadline_control('region'),
             
             dbc.Col([
                 html.Label("Country"),
@@ -42,7 +49,9 @@ def region_layout():
             ], width=2),
 
             dbc.Col([
-                dbc.Button("Show region Sample", id="submit-region", color="primary", className="mt-4")
+                dbc.Button("Show region Sample", id="submit-region", color="primary", className="mt-4"),
+                # Hourly forecasts for the same sample, compared city by city
+                dbc.Button("Compare forecasts", id="submit-forecast-region", color="secondary", className="mt-2")
             ], width=2)
 
         ], className="mb-4"),
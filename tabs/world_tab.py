@@ -1,6 +1,6 @@
 from dash import html, dcc
 import dash_bootstrap_components as dbc
-from views.progress_view import render_progress_view
+from views.progress_view import render_progress_view, render_deadline_control, render_sampling_control
 
 def world_layout():
     return dbc.Row([
@@ -15,11 +15,16 @@ def world_layout():
                 value=200,
                 marks={i: str(i) for i in range(100, 401, 50)},
                 tooltip={"placement": "bottom", "always_visible": True}
-            )
-        ], width=10),
+            ),
+            render_sampling_control('world')
+        ], width=8),
+
+        render_deadline_control('world'),
 
         dbc.Col([
-            dbc.Button("Generate World Data", id="submit-world", color="primary", className="mt-4")
+            dbc.Button("Generate World Data", id="submit-world", color="primary", className="mt-4"),
+            # Every city from the last `python sweep.py` run, drawn as a level-of-detail map
+            dbc.Button("Show last full sweep", id="show-sweep-world", color="link", size="sm", className="mt-1 p-0")
         ], width=2),
         
         render_progress_view('world')
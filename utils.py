@@ -1,101 +1,96 @@
+import os
+import time
+import zlib
+import numpy as np
 import pandas as pd
-
-def get_world_df(cities: pd.DataFrame, cap_size: int = 400) -> pd.DataFrame:
-    cities = cities.copy()
-    
-    #Compute average location per country
-    country_avg = cities.groupby("country")[["lat", "lon"]].mean().reset_index()
-
-    #Compute average location per region (with country for lookup)
-    region_avg = cities.groupby(["country", "region"])[["lat", "lon"]].mean().reset_index()
+from metrics import timed
+from cache import TTLCache, coordinate_key
+from data import get_representative_points
+from sampling import SAMPLING_STRATEGY, check_strategy
+
+# Samples are seeded per (scope, selection, cap_size, strategy, epoch): repeat submissions get
+# the same points (so the observation cache can serve them) while the epoch still
+# rotates which points are shown every SAMPLE_EPOCH_HOURS.
+SAMPLE_EPOCH_HOURS = float(os.getenv("SAMPLE_EPOCH_HOURS", "24"))
+sample_plan_cache = TTLCache(SAMPLE_EPOCH_HOURS * 3600, maxsize=512)
+
+# Farthest-point sampling takes a cached city over an uncached one up to this much farther from the samples
+CACHED_PREFERENCE = 1.25
+EARTH_RADIUS_KM = 6371.0
+
+def mark_cached(df: pd.DataFrame, prefer) -> pd.Series:
+    """Which rows have coordinates in `prefer` (a set of cache.coordinate_key tuples)."""
+    if not prefer:
+        return pd.Series(False, index=df.index)
+    return pd.Series([coordinate_key(lat, lon) in prefer for lat, lon in zip(df["lat"], df["lon"])], index=df.index)
+
+def pick_one(available: pd.DataFrame, cached: pd.Series, rng) -> pd.DataFrame:
+    """One random row, taken from the already-cached rows when there are any."""
+    preferred = available[cached.loc[available.index]]
+    return (preferred if not preferred.empty else available).sample(n=1, random_state=rng)
+
+def sample_representative_points(points: pd.DataFrame, cap_size: int, rng, prefer=None) -> pd.DataFrame:
+    """Every country point, then one region per country per round until cap_size is reached."""
+    countries = points[points["kind"] == "country"]
+    country_points = countries[["country", "lat", "lon"]].reset_index(drop=True)
+    # A country's point is one of its region points; don't pick that region twice
+    region_points = points[points["kind"] == "region"]
+    region_points = region_points[~region_points.set_index(["country", "region"]).index.isin(
+        countries.set_index(["country", "region"]).index)].reset_index(drop=True)
+    region_cached = mark_cached(region_points, prefer).to_numpy()
 
     #Count regions per country and sort descending
-    region_counts = region_avg.groupby("country").size().reset_index(name="region_count")
+    region_counts = region_points.groupby("country").size().reset_index(name="region_count")
     sorted_countries = region_counts.sort_values(by="region_count", ascending=False)["country"].tolist()
 
-    #Select one random region per country (without repetition), until cap_size is reached
-    cap_size -= len(country_avg)
-    selected_regions = []
-    used_regions = set()
+    #Select one random region per country (without repetition), until cap_size is reached,
+    #preferring regions whose observation is already cached
+    cap_size -= len(country_points)
+    remaining = {country: list(rows) for country, rows in region_points.groupby("country").indices.items()}
+    selected = []
 
-    while len(selected_regions) < cap_size:
+    while len(selected) < cap_size:
         added_in_round = False
         for country in sorted_countries:
-            if len(selected_regions) >= cap_size:
+            if len(selected) >= cap_size:
                 break
 
-            # Filter unselected regions for this country
-            available = region_avg[(region_avg["country"] == country) &
-                                   (~region_avg[["country", "region"]]
-                                     .apply(tuple, axis=1).isin(used_regions))]
-            if not available.empty:
-                chosen = available.sample(n=1)
-                used_regions.add((chosen.iloc[0]["country"], chosen.iloc[0]["region"]))
-                selected_regions.append(chosen[["country", "lat", "lon"]])
+            available = remaining[country]
+            if available:
+                cached = [row for row in available if region_cached[row]]
+                pool = cached or available
+                chosen = pool[rng.integers(len(pool))]
+                available.remove(chosen)
+                selected.append(chosen)
                 added_in_round = True
 
         if not added_in_round:
             break  # No more unique regions left
 
     #Combine results
-    if selected_regions:
-        regions_df = pd.concat(selected_regions, ignore_index=True)
-        result_df = pd.concat([country_avg, regions_df], ignore_index=True)
-    else:
-        result_df = country_avg.copy()
-
-    return result_df
-
-def get_continent_df(cities: pd.DataFrame, continent: str, cap_size: int = 400) -> pd.DataFrame:
-    cities = cities.copy()
-    
-    #Filter countries for the given continent
-    cities = cities[cities['continent']==continent].copy()
-    
-    #Compute average location per country
-    country_avg = cities.groupby("country")[["lat", "lon"]].mean().reset_index()
-
-    #Compute average location per region (with country for lookup)
-    region_avg = cities.groupby(["country", "region"])[["lat", "lon"]].mean().reset_index()
-
-    #Count regions per country and sort descending
-    region_counts = region_avg.groupby("country").size().reset_index(name="region_count")
-    sorted_countries = region_counts.sort_values(by="region_count", ascending=False)["country"].tolist()
+    regions_df = region_points.iloc[selected][["country", "lat", "lon"]]
+    return pd.concat([country_points, regions_df], ignore_index=True)
 
-    #Select one random region per country (without repetition), until cap_size is reached
-    cap_size -= len(country_avg)
-    selected_regions = []
-    used_regions = set()
+@timed("sampling.world")
+def get_world_df(cap_size: int = 400, seed=None, prefer=None) -> pd.DataFrame:
+    # Country/region points come from the precomputed table (data/representative_points.csv,
+    # derived from cities.csv and regions.csv), so there is no per-request groupby
+    rng = np.random.default_rng(seed)
+    return sample_representative_points(get_representative_points(), cap_size, rng, prefer)
 
-    while len(selected_regions) < cap_size:
-        added_in_round = False
-        for country in sorted_countries:
-            if len(selected_regions) >= cap_size:
-                break
-
-            # Filter unselected regions for this country
-            available = region_avg[(region_avg["country"] == country) &
-                                   (~region_avg[["country", "region"]]
-                                     .apply(tuple, axis=1).isin(used_regions))]
-            if not available.empty:
-                chosen = available.sample(n=1)
-                used_regions.add((chosen.iloc[0]["country"], chosen.iloc[0]["region"]))
-                selected_regions.append(chosen[["country", "lat", "lon"]])
-                added_in_round = True
-
-        if not added_in_round:
-            break  # No more unique regions left
+@timed("sampling.continent")
+def get_continent_df(continent: str, cap_size: int = 400, seed=None, prefer=None) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    points = get_representative_points()
 
-    #Combine results
-    if selected_regions:
-        regions_df = pd.concat(selected_regions, ignore_index=True)
-        result_df = pd.concat([country_avg, regions_df], ignore_index=True)
-    else:
-        result_df = country_avg.copy()
+    #Filter countries for the given continent
+    points = points[points["continent"] == continent]
 
-    return result_df
+    return sample_representative_points(points, cap_size, rng, prefer)
 
-def get_country_df(cities: pd.DataFrame, country: str, cap_size: int = 400) -> pd.DataFrame:
+@timed("sampling.country")
+def get_country_df(cities: pd.DataFrame, country: str, cap_size: int = 400, seed=None, prefer=None) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
     cities = cities.copy()
     
     # Filter cities for the given country
@@ -104,6 +99,8 @@ def get_country_df(cities: pd.DataFrame, country: str, cap_size: int = 400) -> p
     if country_df.empty:
         return pd.DataFrame(columns=["city", "region", "country", "lat", "lon"])  # Return empty if no data
 
+    country_cached = mark_cached(country_df, prefer)
+
     # Count cities per region
     region_counts = country_df.groupby("region").size().reset_index(name="city_count")
     sorted_regions = region_counts.sort_values(by="city_count", ascending=False)["region"].tolist()
@@ -123,7 +120,7 @@ def get_country_df(cities: pd.DataFrame, country: str, cap_size: int = 400) -> p
                                        (~country_df.index.isin(used_indices))]
 
             if not region_cities.empty:
-                chosen = region_cities.sample(n=1)
+                chosen = pick_one(region_cities, country_cached, rng)
                 used_indices.add(chosen.index[0])
                 selected_cities.append(chosen)
 
@@ -140,7 +137,9 @@ def get_country_df(cities: pd.DataFrame, country: str, cap_size: int = 400) -> p
 
     return result_df
 
-def get_region_df(cities: pd.DataFrame, country_name: str, region: str, cap_size: int) -> pd.DataFrame:
+@timed("sampling.region")
+def get_region_df(cities: pd.DataFrame, country_name: str, region: str, cap_size: int, seed=None, prefer=None) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
     cities = cities.copy()
     
     # Filter to the specific country and region
@@ -150,19 +149,132 @@ def get_region_df(cities: pd.DataFrame, country_name: str, region: str, cap_size
     if region_df.empty:
         return pd.DataFrame(columns=["city", "region", "country", "lat", "lon"])
 
-    # Cap sample size to what's available
+    # Cap sample size to what's available, taking already-cached cities first
     sample_size = min(cap_size, len(region_df))
-    return region_df.sample(n=sample_size).reset_index(drop=True)
+    cached = mark_cached(region_df, prefer)
+    preferred = region_df[cached]
+    preferred = preferred.sample(n=min(sample_size, len(preferred)), random_state=rng)
+    rest = region_df[~cached].sample(n=sample_size - len(preferred), random_state=rng)
+    return pd.concat([preferred, rest]).reset_index(drop=True)
+
+# A name that occurs more than once in a region is picked as "name@lat,lon" (place_hierarchy.build_cities)
+CITY_COORDINATES_SEPARATOR = "@"
 
+def city_value(city: str, lat: float, lon: float) -> str:
+    return f"{city}{CITY_COORDINATES_SEPARATOR}{lat!r},{lon!r}"
+
+@timed("sampling.city")
 def get_city_row(cities: pd.DataFrame, country_name: str, region: str, city_name: str) -> pd.DataFrame:
+    if not city_name:
+        return cities.iloc[0:0].reset_index(drop=True)
     cities = cities.copy()
     
     # Filter to match all three conditions
+    city_name, _, coordinates = city_name.partition(CITY_COORDINATES_SEPARATOR)
     city_row = cities[
         (cities["country"] == country_name) &
         (cities["region"] == region) &
         (cities["city"] == city_name)
     ]
+    if coordinates:
+        lat, lon = map(float, coordinates.split(","))
+        city_row = city_row[(city_row["lat"] == lat) & (city_row["lon"] == lon)]
 
     # Return the row (or empty DataFrame if not found)
     return city_row.reset_index(drop=True)
+
+def unit_vectors(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(np.asarray(lat, dtype=np.float64)), np.radians(np.asarray(lon, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def scope_cities(cities: pd.DataFrame, scope: str, *selection) -> pd.DataFrame:
+    """Every city of a scope's selection, e.g. scope_cities(cities, "region", "france", "bretagne")."""
+    if scope == "world":
+        return cities
+    if scope == "continent":
+        return cities[cities["continent"] == selection[0]]
+    if scope == "country":
+        return cities[cities["country"] == selection[0]]
+    return cities[(cities["country"] == selection[0]) & (cities["region"] == selection[1])]
+
+def farthest_point_sample(candidates: pd.DataFrame, cap_size: int, rng, prefer=None) -> pd.DataFrame:
+    """Greedy farthest-point sampling on the sphere: each pick is the candidate farthest from all
+    picks so far, so the rows come out in coverage order (a prefix is itself evenly spread)."""
+    n = min(cap_size, len(candidates))
+    if n == 0:
+        return candidates.iloc[:0].reset_index(drop=True)
+    xyz = unit_vectors(candidates["lat"], candidates["lon"])
+    cached = mark_cached(candidates, prefer).to_numpy()
+    # Gaps are squared chord lengths, so the preference is squared too
+    weight = np.where(cached, CACHED_PREFERENCE ** 2, 1.0)
+
+    start = np.flatnonzero(cached) if cached.any() else np.arange(len(candidates))
+    picks = [int(rng.choice(start))]
+    gap = np.full(len(candidates), np.inf)  # squared chord to the nearest pick
+    while len(picks) < n:
+        gap = np.minimum(gap, ((xyz - xyz[picks[-1]]) ** 2).sum(axis=1))
+        chosen = int(np.argmax(gap * weight))
+        if gap[chosen] == 0:
+            break  # only duplicates of picked coordinates are left
+        picks.append(chosen)
+    return candidates.iloc[picks].reset_index(drop=True)
+
+def coverage_km(candidates: pd.DataFrame, sample: pd.DataFrame, block: int = 4096) -> dict:
+    """Mean and 95th percentile distance (km) from each candidate city to its nearest sample point."""
+    if candidates.empty or sample.empty:
+        return {"mean_km": None, "p95_km": None}
+    xyz = unit_vectors(candidates["lat"], candidates["lon"])
+    points = unit_vectors(sample["lat"], sample["lon"])
+    nearest = np.concatenate([(xyz[i:i + block] @ points.T).max(axis=1) for i in range(0, len(xyz), block)])
+    km = EARTH_RADIUS_KM * np.arccos(np.clip(nearest, -1, 1))
+    return {"mean_km": round(float(km.mean()), 1), "p95_km": round(float(np.percentile(km, 95)), 1)}
+
+@timed("sampling.coverage")
+def get_coverage_df(cities: pd.DataFrame, scope: str, *selection, cap_size: int = 400, seed=None, prefer=None) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return farthest_point_sample(scope_cities(cities, scope, *selection), cap_size, rng, prefer)
+
+def result_coverage(cities: pd.DataFrame, plan: pd.DataFrame, result: pd.DataFrame) -> dict:
+    """The plan's attrs["coverage"], recomputed on the rows actually fetched when some are missing."""
+    coverage = plan.attrs["coverage"]
+    if len(result) >= coverage["points"]:
+        return coverage
+    candidates = scope_cities(cities, coverage["scope"], *coverage["selection"])
+    return {**coverage, "points": len(result), **coverage_km(candidates, result)}
+
+# World/Continent sample the representative points, Country/Region the cities passed in
+SAMPLERS = {
+    "world": get_world_df,
+    "continent": get_continent_df,
+    "country": get_country_df,
+    "region": get_region_df,
+}
+
+def current_sample_epoch(now=None):
+    return int((now or time.time()) // (SAMPLE_EPOCH_HOURS * 3600))
+
+def get_sample_plan(scope: str, cities: pd.DataFrame, *selection, cap_size: int, prefer=None,
+                    strategy: str = SAMPLING_STRATEGY) -> pd.DataFrame:
+    """Cached, seeded sample for a scope, e.g. get_sample_plan("country", cities, "france", cap_size=100).
+
+    The same (scope, selection, cap_size, strategy) returns the same points until the epoch
+    rotates. When a new plan is drawn, coordinates in `prefer` (fresh cached observations)
+    are chosen first within each country/region. The plan carries attrs["coverage"]: how
+    far the scope's cities are from their nearest sample point.
+    """
+    key = (scope, selection, cap_size, check_strategy(strategy), current_sample_epoch())
+    plan = sample_plan_cache.get(key)
+    if plan is None:
+        seed = zlib.crc32(repr(key).encode())
+        if strategy == "coverage":
+            plan = get_coverage_df(cities, scope, *selection, cap_size=cap_size, seed=seed, prefer=prefer)
+        elif scope in ("world", "continent"):
+            plan = SAMPLERS[scope](*selection, cap_size, seed=seed, prefer=prefer)
+        else:
+            plan = SAMPLERS[scope](cities, *selection, cap_size, seed=seed, prefer=prefer)
+        plan.attrs["coverage"] = {
+            "strategy": strategy, "scope": scope, "selection": selection, "points": len(plan),
+            **coverage_km(scope_cities(cities, scope, *selection), plan),
+        }
+        sample_plan_cache.set(key, plan)
+    return plan
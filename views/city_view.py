@@ -3,8 +3,10 @@ import plotly.graph_objects as go # For gauge chart
 import plotly.express as px
 from dash import dash_table, html, dcc
 import pandas as pd
+from metrics import timed
 import dash_bootstrap_components as dbc # <--- ADD THIS LINE
 
+@timed("render.city")
 def render_city_view(df: pd.DataFrame):
     if df is None or df.empty:
         return html.Div("No weather data available. Select a city and click 'Get Weather'.", style={"color": "red"})
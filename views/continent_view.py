@@ -2,7 +2,14 @@
 import plotly.express as px
 from dash import dash_table, html, dcc
 import pandas as pd
+from metrics import timed
+from geo_assets import geo_graph_config
+from views.progress_view import render_partial_notice, render_coverage_note, sized_by_temperature
+from views.surface_layer import add_surface_layer
+from views.lod_layer import lod_figure
+from pyramid import lod_enabled
 
+@timed("render.continent")
 def render_continent_view(df: pd.DataFrame):
     if df is None or df.empty:
         return html.Div(
@@ -18,19 +25,29 @@ def render_continent_view(df: pd.DataFrame):
     avg_temp_by_country = df.groupby('country')['temp_c'].mean().reset_index()
 
 
-    # --- Scatter Map for Cities in Continent ---
-    fig_map = px.scatter_geo(
-        df,
-        lat="lat",
-        lon="lon",
-        color="temp_c",
-        hover_name="city",
-        size="temp_c",
-        projection="natural earth", # 'natural earth' is a good projection for continents
-        title=f"Current City Temperatures in {selected_continent}",
-        color_continuous_scale=px.colors.sequential.Plasma,
-        height=600
-    )
+    title = f"Current City Temperatures in {selected_continent}"
+    lod = None
+    if lod_enabled(df):
+        # Too many points for one marker each: aggregated cells, re-queried on zoom and pan
+        fig_map, lod = lod_figure(df, "natural earth", title, 600, resolution_deg=1.5, fit=True, surface_marker_size=9)
+    else:
+        df, marker_args = sized_by_temperature(df)
+        # --- Scatter Map for Cities in Continent ---
+        fig_map = px.scatter_geo(
+            df,
+            lat="lat",
+            lon="lon",
+            color="temp_c",
+            hover_name="city",
+            **marker_args,
+            projection="natural earth", # 'natural earth' is a good projection for continents
+            title=title,
+            color_continuous_scale=px.colors.sequential.Plasma,
+            height=600
+        )
+        # Interpolated temperature surface underneath the city markers, fitted to the continent
+        add_surface_layer(fig_map, df, resolution_deg=1.5, fit=True, marker_size=9)
+
     fig_map.update_layout(
         geo=dict(
             showland = True,
@@ -49,6 +66,9 @@ def render_continent_view(df: pd.DataFrame):
     )
 
     return html.Div([
+        render_partial_notice(df),
+        render_coverage_note(df),
         html.H4(f"Weather in {selected_continent}", className="mb-3 text-center", style={'color': '#444'}),
-        dcc.Graph(figure=fig_map, className="mb-4"),
+        dcc.Store(id="continent-map-lod", data=lod),
+        dcc.Graph(id="continent-map", figure=fig_map, config=geo_graph_config(), className="mb-4"),
     ], style={'background-color': 'rgba(255,255,255,0.4)', 'border-radius': '8px', 'padding': '15px'})
\ No newline at end of file
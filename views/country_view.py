@@ -2,7 +2,11 @@
 import plotly.express as px
 from dash import html, dcc # Removed dash_table as it's no longer used
 import pandas as pd
+from metrics import timed
+from geo_assets import geo_graph_config
+from views.progress_view import render_partial_notice, render_coverage_note, sized_by_temperature
 
+@timed("render.country")
 def render_country_view(df: pd.DataFrame):
     if df is None or df.empty:
         return html.Div(
@@ -12,6 +16,7 @@ def render_country_view(df: pd.DataFrame):
 
     selected_country = df['country'].iloc[0].title() if 'country' in df.columns and not df.empty else "Selected Country"
 
+    df, marker_args = sized_by_temperature(df)
     # --- Scatter Map for Cities in Country ---
     fig_map = px.scatter_geo(
         df,
@@ -19,7 +24,7 @@ def render_country_view(df: pd.DataFrame):
         lon="lon",
         color="temp_c",
         hover_name="city",
-        size="temp_c",
+        **marker_args,
         # Removed scope="world" as fitbounds="locations" handles the zoom
         title=f"Current City Temperatures in {selected_country}",
         color_continuous_scale=px.colors.sequential.Plasma,
@@ -43,6 +48,8 @@ def render_country_view(df: pd.DataFrame):
     )
 
     return html.Div([
+        render_partial_notice(df),
+        render_coverage_note(df),
         html.H4(f"Weather in {selected_country}", className="mb-3 text-center", style={'color': '#444'}),
-        dcc.Graph(figure=fig_map, className="mb-4"), # Only the map remains
+        dcc.Graph(figure=fig_map, config=geo_graph_config(), className="mb-4"), # Only the map remains
     ], style={'background-color': 'rgba(255,255,255,0.3)', 'border-radius': '8px', 'padding': '15px'})
\ No newline at end of file
@@ -0,0 +1,136 @@
+## views/lod_layer.py
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from dash import Patch
+from pyramid import LEVEL_SIZES_DEG, get_pyramid
+from views.surface_layer import add_surface_layer
+
+# Level whose cells (4 degrees) feed the interpolated surface of a large result
+SURFACE_LEVEL = 2
+# Whole-globe extent at projection scale 1: (lat span, lon span)
+WORLD_SPANS = {"orthographic": (180, 180), "natural earth": (180, 360)}
+# Margin around the visible window, so panning does not immediately show empty edges
+VIEW_PADDING = 1.2
+
+
+def cell_trace_data(level, cells):
+    size = LEVEL_SIZES_DEG[level]
+    return {
+        "lat": np.round(cells["lat"], 4).tolist(),
+        "lon": np.round(cells["lon"], 4).tolist(),
+        "color": cells["mean"].tolist(),
+        # Busier cells are drawn larger: 5px for a single city up to 18px
+        "size": np.clip(5 + 2 * np.log2(cells["count"]), 5, 18).round(1).tolist(),
+        "text": [
+            f"{n} {'city' if n == 1 else 'cities'} ({size:g}° cell)<br>mean {m:.1f}°C, {lo:.1f} to {hi:.1f}°C"
+            for n, m, lo, hi in zip(cells["count"], cells["mean"], cells["min"], cells["max"])
+        ],
+    }
+
+
+def initial_viewport(df, projection):
+    """Viewport state for the lod store: the extent shown before the first zoom or pan."""
+    lat_span, lon_span = WORLD_SPANS[projection]
+    if projection == "orthographic":
+        return {"projection": projection, "center": [0, 0], "spans": [lat_span, lon_span], "scale": 1}
+    # fitbounds="locations": the initial extent is the data's bounding box
+    lat, lon = df["lat"], df["lon"]
+    return {
+        "projection": projection,
+        "center": [float(lat.min() + lat.max()) / 2, float(lon.min() + lon.max()) / 2],
+        "spans": [float(lat.max() - lat.min()), float(lon.max() - lon.min())],
+        "scale": 1,
+    }
+
+
+def update_viewport(viewport, relayout):
+    """Folds a map relayoutData event into the viewport; None when it is not a zoom or pan."""
+    relayout = relayout or {}
+    keys = ("geo.projection.scale", "geo.center.lat", "geo.center.lon",
+            "geo.projection.rotation.lat", "geo.projection.rotation.lon")
+    if not any(key in relayout for key in keys):
+        return None
+    viewport = dict(viewport)
+    lat, lon = viewport["center"]
+    if "geo.projection.scale" in relayout:
+        # Reported scales are relative to the whole globe, also after fitbounds
+        viewport["scale"] = relayout["geo.projection.scale"]
+        viewport["spans"] = list(WORLD_SPANS[viewport["projection"]])
+    if viewport["projection"] == "orthographic":
+        lat = relayout.get("geo.projection.rotation.lat", lat)
+        lon = relayout.get("geo.projection.rotation.lon", lon)
+    else:
+        lat = relayout.get("geo.center.lat", lat)
+        lon = relayout.get("geo.center.lon", lon)
+    viewport["center"] = [lat, lon]
+    return viewport
+
+
+def viewport_bounds(viewport):
+    """(lat_min, lat_max, lon_min, lon_max) of the visible window, for Pyramid.query."""
+    lat, lon = viewport["center"]
+    lat_half = viewport["spans"][0] * VIEW_PADDING / 2 / viewport["scale"]
+    lon_half = viewport["spans"][1] * VIEW_PADDING / 2 / viewport["scale"]
+    if viewport["projection"] == "orthographic":
+        # Longitudes converge towards the poles, so the same width covers more degrees
+        lon_half /= max(np.cos(np.radians(min(abs(lat), 89))), 1e-3)
+    lat_min, lat_max = max(lat - lat_half, -90), min(lat + lat_half, 90)
+    if lon_half >= 180 or lat_min == -90 or lat_max == 90:
+        return lat_min, lat_max, -180, 180
+    wrap = lambda x: (x + 180) % 360 - 180
+    return lat_min, lat_max, wrap(lon - lon_half), wrap(lon + lon_half)
+
+
+def lod_figure(df, projection, title, height, resolution_deg, fit=False, surface_marker_size=7):
+    """Map of a large result drawn from its pyramid: (figure, data of the map's lod store)."""
+    key, pyramid = get_pyramid(df)
+    viewport = initial_viewport(df, projection)
+    level, cells = pyramid.query(viewport_bounds(viewport))
+    data = cell_trace_data(level, cells)
+
+    fig = go.Figure(go.Scattergeo(
+        lat=data["lat"],
+        lon=data["lon"],
+        mode="markers",
+        marker=dict(color=data["color"], size=data["size"], coloraxis="coloraxis", line=dict(width=0)),
+        hovertext=data["text"],
+        hoverinfo="text",
+        showlegend=False,
+        name="Cities",
+    ))
+    # Interpolated surface from coarse cell means instead of every observation
+    coarse = pyramid.levels[SURFACE_LEVEL]
+    surface_df = pd.DataFrame({"lat": coarse["lat"], "lon": coarse["lon"], "temp_c": coarse["mean"]})
+    add_surface_layer(fig, surface_df, resolution_deg=resolution_deg, fit=fit, marker_size=surface_marker_size)
+
+    fig.update_layout(
+        title=title,
+        height=height,
+        geo=dict(projection_type=projection),
+        # Fixed colour range: cell means are smoother at coarse levels, colours must not shift on zoom
+        coloraxis=dict(
+            colorscale=px.colors.sequential.Plasma,
+            cmin=float(df["temp_c"].min()),
+            cmax=float(df["temp_c"].max()),
+            colorbar=dict(title="temp_c"),
+        ),
+        # Keeps the user's zoom and rotation when lod_patch swaps the cells
+        uirevision="lod",
+    )
+    return fig, {"key": key, "trace": len(fig.data) - 1, "level": level, "viewport": viewport}
+
+
+def lod_patch(pyramid, lod):
+    """Figure patch replacing the cells trace with the visible cells of lod["viewport"]."""
+    level, cells = pyramid.query(viewport_bounds(lod["viewport"]))
+    data = cell_trace_data(level, cells)
+    patch = Patch()
+    trace = patch["data"][lod["trace"]]
+    trace["lat"] = data["lat"]
+    trace["lon"] = data["lon"]
+    trace["hovertext"] = data["text"]
+    trace["marker"]["color"] = data["color"]
+    trace["marker"]["size"] = data["size"]
+    return patch, level, len(data["lat"])
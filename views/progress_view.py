@@ -1,6 +1,8 @@
 ## views/progress_view.py
+import os
 from dash import html, dcc
 import dash_bootstrap_components as dbc
+from sampling import SAMPLING_STRATEGIES, SAMPLING_STRATEGY
 
 def render_progress_view(prefix = ''):
     return dbc.Col([
@@ -15,4 +17,61 @@ def render_progress_view(prefix = ''):
         )
         ], style={"display": "none"}, className='my-3'),
     html.Div(id=f"weather-output-{prefix}", className="mt-4")
-    ], width=12)
\ No newline at end of file
+    ], width=12)
+
+def render_deadline_control(prefix = ''):
+    """Time budget for a fetch: at the deadline the points fetched so far are shown."""
+    # Same default as data_loader.FETCH_DEADLINE_SECONDS (read here so pandas stays unloaded)
+    default = float(os.getenv("FETCH_DEADLINE_SECONDS", "0"))
+    return dbc.Col([
+        html.Label("Time budget"),
+        dcc.Dropdown(
+            id=f"deadline-{prefix}",
+            options=[{"label": "No limit", "value": 0}] + [{"label": f"{s} s", "value": s} for s in (2, 5, 10, 30)],
+            value=default,
+            clearable=False,
+            className="mb-3"
+        )
+    ], width=2)
+
+def render_sampling_control(prefix = ''):
+    """How points are sampled: round-robin over regions, or spread for even map coverage."""
+    return dcc.RadioItems(
+        id=f"sampling-{prefix}",
+        options=[{"label": f" {label}", "value": value} for value, label in SAMPLING_STRATEGIES.items()],
+        value=SAMPLING_STRATEGY,
+        inline=True,
+        inputStyle={"margin-left": "12px"},
+        className="mt-3 small"
+    )
+
+def render_coverage_note(df):
+    """How far the scope's cities are from the nearest sampled point (utils.coverage_km)."""
+    coverage = df.attrs.get("coverage") if df is not None else None
+    if not coverage or coverage.get("mean_km") is None:
+        return None
+    strategy = SAMPLING_STRATEGIES[coverage["strategy"]].lower()
+    return html.Small(
+        f"Sample of {coverage['points']} points ({strategy}): cities are on average {coverage['mean_km']:.0f} km "
+        f"from the nearest sampled point, 95% within {coverage['p95_km']:.0f} km.",
+        className="text-muted d-block mb-2"
+    )
+
+def render_partial_notice(df):
+    """Note shown above a view rendered from a partial (deadline) result."""
+    partial = df.attrs.get("partial") if df is not None else None
+    if not partial:
+        return None
+    return dbc.Alert(
+        f"Showing {partial['fetched']} of {partial['total']} points: the time budget ran out. "
+        "The rest are still loading in the background and will be ready on the next run.",
+        color="warning", className="mb-3"
+    )
+
+def marker_sizes(df):
+    # Marker size must be >= 0, so shift temperatures: the coldest point gets the smallest marker
+    return df["temp_c"] - df["temp_c"].min() + 1
+
+def sized_by_temperature(df):
+    """(df with a marker_size column, scatter_geo arguments that size by it without showing it on hover)."""
+    return df.assign(marker_size=marker_sizes(df)), {"size": "marker_size", "hover_data": {"marker_size": False}}
@@ -2,7 +2,11 @@
 import plotly.express as px
 from dash import html, dcc # Removed dash_table as it's no longer used
 import pandas as pd
+from metrics import timed
+from geo_assets import geo_graph_config
+from views.progress_view import render_partial_notice, render_coverage_note, sized_by_temperature
 
+@timed("render.region")
 def render_region_view(df: pd.DataFrame):
     if df is None or df.empty:
         return html.Div(
@@ -13,6 +17,7 @@ def render_region_view(df: pd.DataFrame):
     selected_country = df['country'].iloc[0].title() if 'country' in df.columns and not df.empty else "Selected Country"
     selected_region = df['region'].iloc[0].title() if 'region' in df.columns and not df.empty else "Selected Region"
 
+    df, marker_args = sized_by_temperature(df)
     # --- Scatter Map for Cities in Region ---
     fig_map = px.scatter_geo(
         df,
@@ -20,7 +25,7 @@ def render_region_view(df: pd.DataFrame):
         lon="lon",
         color="temp_c",
         hover_name="city",
-        size="temp_c",
+        **marker_args,
         # Removed scope="world" as fitbounds="locations" handles the zoom
         title=f"Current City Temperatures in {selected_region}, {selected_country}",
         color_continuous_scale=px.colors.sequential.Plasma,
@@ -44,6 +49,56 @@ def render_region_view(df: pd.DataFrame):
     )
 
     return html.Div([
+        render_partial_notice(df),
+        render_coverage_note(df),
         html.H4(f"Weather in {selected_region}, {selected_country}", className="mb-3 text-center", style={'color': '#444'}),
-        dcc.Graph(figure=fig_map, className="mb-4"), # Only the map remains
-    ], style={'background-color': 'rgba(255,255,255,0.4)', 'border-radius': '8px', 'padding': '15px'})
\ No newline at end of file
+        dcc.Graph(figure=fig_map, config=geo_graph_config(), className="mb-4"), # Only the map remains
+    ], style={'background-color': 'rgba(255,255,255,0.4)', 'border-radius': '8px', 'padding': '15px'})
+
+@timed("render.region_forecast")
+def render_region_forecast_view(df: pd.DataFrame):
+    """City x hour heatmaps of temperature and chance of rain from a long-format forecast frame."""
+    if df is None or df.empty:
+        return html.Div(
+            "No forecast data available. Select a region and click 'Compare forecasts'.",
+            style={"color": "red", 'background-color': 'rgba(255,255,255,0.7)', 'padding': '15px', 'border-radius': '8px'}
+        )
+
+    selected_country = df['country'].iloc[0].title()
+    selected_region = df['region'].iloc[0].title()
+
+    # One row per place, not per name: a region can have two cities of the same name
+    places = df[["city", "lat", "lon"]].drop_duplicates()
+    names = places["city"].str.title()
+    duplicate = names.duplicated(keep=False)
+    places["place"] = names.where(~duplicate, names + " (" + places["lat"].astype(str) + ", " + places["lon"].astype(str) + ")")
+    df = df.merge(places, on=["city", "lat", "lon"]).assign(time=lambda d: pd.to_datetime(d["time"]))
+    # North to south, so neighbouring rows are neighbouring cities
+    order = places.sort_values("lat", ascending=False)["place"]
+
+    def heatmap(column, title, scale, label):
+        grid = df.pivot_table(index="place", columns="time", values=column).reindex(order)
+        fig = px.imshow(
+            grid,
+            aspect="auto",
+            color_continuous_scale=scale,
+            labels={"x": "Time", "y": "", "color": label},
+            title=title,
+            height=max(300, 28 * len(grid) + 120)
+        )
+        fig.update_layout(
+            margin={"r": 0, "t": 50, "l": 0, "b": 0},
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)'
+        )
+        return fig
+
+    fig_temp = heatmap("temp_c", "Hourly Temperature (°C)", px.colors.sequential.Plasma, "°C")
+    fig_rain = heatmap("chance_of_rain", "Chance of Rain (%)", px.colors.sequential.Blues, "%")
+
+    return html.Div([
+        html.H4(f"Forecast comparison for {selected_region}, {selected_country}", className="mb-3 text-center", style={'color': '#444'}),
+        html.P(f"{len(order)} cities, next {df['time'].dt.normalize().nunique()} days", className="text-center text-muted"),
+        dcc.Graph(figure=fig_temp, className="mb-4"),
+        dcc.Graph(figure=fig_rain, className="mb-4"),
+    ], style={'background-color': 'rgba(255,255,255,0.4)', 'border-radius': '8px', 'padding': '15px'})
@@ -0,0 +1,30 @@
+## views/surface_layer.py
+import plotly.graph_objects as go
+import pandas as pd
+from interpolation import temperature_surface
+
+def add_surface_layer(fig, df: pd.DataFrame, resolution_deg=3.0, fit=False, marker_size=7):
+    """Adds the interpolated temperature surface as a layer underneath the city markers."""
+    lat, lon, values = temperature_surface(df, resolution_deg=resolution_deg, fit=fit)
+    if len(values) == 0:
+        return fig
+
+    fig.add_trace(go.Scattergeo(
+        lat=lat,
+        lon=lon,
+        mode="markers",
+        marker=dict(
+            symbol="square",
+            size=marker_size,
+            color=values,
+            coloraxis="coloraxis", # Share the markers' Plasma colour scale
+            opacity=0.35,
+            line=dict(width=0)
+        ),
+        hoverinfo="skip",
+        showlegend=False,
+        name="Interpolated temperature"
+    ))
+    # Move the surface to the bottom so the observed points stay on top
+    fig.data = (fig.data[-1],) + fig.data[:-1]
+    return fig
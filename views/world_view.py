@@ -1,9 +1,22 @@
 # views/world_view.py
 
 import plotly.express as px
-from dash import dash_table, html, dcc
+from dash import dash_table, html, dcc, Patch
+import dash_bootstrap_components as dbc
 import pandas as pd
+from metrics import timed
+from geo_assets import geo_graph_config
+from views.progress_view import render_partial_notice, render_coverage_note, marker_sizes, sized_by_temperature
+from views.surface_layer import add_surface_layer
+from views.lod_layer import lod_figure
+from pyramid import lod_enabled
 
+# Above this share of changed points a refresh re-sends whole arrays instead of per-point patches
+FULL_PATCH_SHARE = 0.2
+# Rows of a large (level-of-detail) result sent to the table; the map shows all of them
+LOD_TABLE_ROWS = 500
+
+@timed("render.world")
 def render_world_view(df: pd.DataFrame):
     """
     Renders the world weather view with a scatter geo map and a data table.
@@ -18,19 +31,31 @@ def render_world_view(df: pd.DataFrame):
             style={"color": "red", "textAlign": "center", "marginTop": "20px", 'background-color': 'rgba(255,255,255,0.7)'} # Added background to this message div
         )
 
-    # --- Global Temperature Map (Scatter Geo) ---
-    fig_map = px.scatter_geo(
-        df,
-        lat="lat",
-        lon="lon",
-        color="temp_c",  # Color points by temperature in Celsius
-        hover_name="city", # Show city name on hover
-        size="temp_c",     # Size points by temperature (optional, adjust as desired)
-        projection="orthographic", # Corrected for spherical view
-        title="Current City Temperatures Worldwide",
-        color_continuous_scale=px.colors.sequential.Plasma, # A vibrant color scale
-        height=650
-    )
+    lod = None
+    if lod_enabled(df):
+        # Too many points for one marker each: aggregated cells, re-queried on zoom and pan
+        fig_map, lod = lod_figure(df, "orthographic", "Current City Temperatures Worldwide", 650, resolution_deg=3.0)
+        traces = None
+    else:
+        # --- Global Temperature Map (Scatter Geo) ---
+        sized_df, marker_args = sized_by_temperature(df)
+        fig_map = px.scatter_geo(
+            sized_df,
+            lat="lat",
+            lon="lon",
+            color="temp_c",  # Color points by temperature in Celsius
+            hover_name="city", # Show city name on hover
+            **marker_args,     # Size points by temperature
+            projection="orthographic", # Corrected for spherical view
+            title="Current City Temperatures Worldwide",
+            color_continuous_scale=px.colors.sequential.Plasma, # A vibrant color scale
+            height=650
+        )
+
+        # --- Interpolated temperature surface underneath the city markers ---
+        add_surface_layer(fig_map, df, resolution_deg=3.0, marker_size=7)
+        # Trace positions for patch_world_view: the markers are last, the surface (if any) first
+        traces = {"markers": len(fig_map.data) - 1, "surface": 0 if len(fig_map.data) > 1 else None}
 
     # --- Customize the Earth's appearance in the map ---
     fig_map.update_layout(
@@ -50,11 +75,24 @@ def render_world_view(df: pd.DataFrame):
     )
 
     return html.Div([ # THIS IS THE OUTER DIV FROM render_world_view
+        render_partial_notice(df),
+        render_coverage_note(df),
         html.H4("Global Weather Overview", className="mb-3 text-center", style={'color': '#444'}),
-        dcc.Graph(figure=fig_map, className="mb-4"),
+        # Re-fetches only the points whose observation expired and patches them in place
+        html.Div([
+            dbc.Button("Refresh", id="refresh-world", color="secondary", size="sm", className="me-2"),
+            html.Small(id="refresh-status-world", className="text-muted"),
+        ], className="mb-2") if lod is None else None,
+        dcc.Store(id="world-map-traces", data=traces),
+        dcc.Store(id="world-map-lod", data=lod),
+        dcc.Graph(id="world-map", figure=fig_map, config=geo_graph_config(), className="mb-4"),
         html.H5("Raw Data Table", className="mb-2", style={'color': '#444'}),
+        html.Small(
+            f"First {LOD_TABLE_ROWS} of {len(df)} rows", className="text-muted"
+        ) if lod is not None else None,
         dash_table.DataTable(
-            data=df.to_dict('records'),
+            id="world-table",
+            data=(df.head(LOD_TABLE_ROWS) if lod is not None else df).to_dict('records'),
             columns=[{"name": col, "id": col} for col in df.columns],
             style_table={'overflowX': 'auto', 'maxHeight': '400px', 'overflowY': 'auto', 'background-color': 'rgba(255,255,255,0.8)', 'border-radius': '5px'},
             style_cell={
@@ -72,4 +110,57 @@ def render_world_view(df: pd.DataFrame):
             page_size=10,
             fixed_rows={'headers': True}
         )
-    ], style={'background-color': 'rgba(255,255,255,0)', 'border-radius': '8px', 'padding': '15px'}) # ADDED: Transparent background for this div
\ No newline at end of file
+    ], style={'background-color': 'rgba(255,255,255,0)', 'border-radius': '8px', 'padding': '15px'}) # ADDED: Transparent background for this div
+
+def patch_world_view(df: pd.DataFrame, refreshed: dict, traces: dict):
+    """Patches for the map figure and table of a rendered world view.
+
+    `df` is the displayed result and `refreshed` maps row positions to re-fetched rows
+    (data_loader.refresh_observations). Returns (updated df, figure patch, table patch,
+    changed row positions); only rows whose values differ are sent.
+    """
+    from result_store import IMPERIAL_UNITS
+    old_df = df
+    df = df.copy()
+    # Imperial columns are derived from the metric ones when a result is read back, so
+    # they are compared and re-derived through the metric values
+    compared = [col for col in df.columns if col not in IMPERIAL_UNITS]
+    changed = []
+    for i, row in refreshed.items():
+        old = df.iloc[i]
+        if any(col in row and row[col] != old[col] for col in compared):
+            changed.append(i)
+            for col in compared:
+                df.iat[i, df.columns.get_loc(col)] = row.get(col, old[col])
+    for col, (metric, convert) in IMPERIAL_UNITS.items():
+        if changed and col in df.columns and metric in df.columns:
+            df.iloc[changed, df.columns.get_loc(col)] = convert(df[metric].iloc[changed]).round(2)
+
+    fig_patch, table_patch = Patch(), Patch()
+    if not changed:
+        return df, fig_patch, table_patch, changed
+
+    markers = fig_patch["data"][traces["markers"]]["marker"]
+    sizes = marker_sizes(df)
+    full = len(changed) > FULL_PATCH_SHARE * len(df)
+    if full:
+        markers["color"] = df["temp_c"].tolist()
+    else:
+        for i in changed:
+            markers["color"][i] = df["temp_c"].iat[i]
+    if full or df["temp_c"].min() != old_df["temp_c"].min():
+        # The size offset moved, so every marker changed size
+        markers["size"] = sizes.tolist()
+    else:
+        for i in changed:
+            markers["size"][i] = sizes.iat[i]
+
+    if traces.get("surface") is not None:
+        from interpolation import temperature_surface
+        # Same observation coordinates, so the same grid cells: only the values change
+        _, _, values = temperature_surface(df, resolution_deg=3.0)
+        fig_patch["data"][traces["surface"]]["marker"]["color"] = values.tolist()
+
+    for i, record in zip(changed, df.iloc[changed].to_dict('records')):
+        table_patch[i] = record
+    return df, fig_patch, table_patch, changed